@@ -3,13 +3,22 @@ import os
 import datetime
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import pandas as pd
-import openpyxl
-import math
-import webbrowser
-from selenium import webdriver
-from selenium.webdriver.common.by import By
+import multiprocessing
+import threading
+import queue
+import time
 import sys
+import json
+import directory_index
+from epc_engine import (DB_FORMATS, DEFAULT_ENCODING, EPC_SCHEMES, SGTIN_PARTITIONS, GenerationCancelled, apply_overage, db_chunks,
+                        decode_epc, encode_epc, epc_template, generate_database, job_manifest_path, load_job_manifest,
+                        normalize_gtin, preview_rows, resumable_progress, roll_index_file_name, roll_plan_file_name, verify_job,
+                        write_roll_index, write_roll_plan)
+from job_creator import create_jobs, read_orders, validate_orders, write_report
+from job_log import append_job_record, generation_record, recent_jobs, timed
+from roll_tracker import fill_roll_tracker
+from serial_ledger import describe_overlaps, find_overlaps, next_free_serial, record_range
+from share_upload import STAGING_PATH
 
 # Define global paths
 base_path = r'Z:\3 Encoding and Printing Files\Customers Encoding Files'
@@ -18,6 +27,23 @@ template_base_path = r'Z:\3 Encoding and Printing Files\Templates'
 # Global variable to store the path of the created job folder
 job_data_folder_path = None
 
+# Progress messages from the generation worker thread and its cancel flag
+generation_queue = queue.Queue()
+cancel_event = threading.Event()
+
+# Result of the background Verify Job run
+verify_queue = queue.Queue()
+
+# Cached customer / label size / template index and the result of its background refresh
+directory_cache = None
+index_queue = queue.Queue()
+
+# Result of the background batch Job Creator run
+batch_queue = queue.Queue()
+
+# Passed by build.py: write the time of the first paint to the given file and exit
+STARTUP_REPORT_FLAG = '--startup-report'
+
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -48,62 +74,33 @@ def select_template():
         template_entry.delete(0, tk.END)
         template_entry.insert(0, file_selected)
 
-def dec_to_bin(value, length):
-    return bin(int(value))[2:].zfill(length)
-
-def bin_to_hex(binary_str):
-    hex_str = hex(int(binary_str, 2))[2:].upper()
-    return hex_str.zfill(len(binary_str) // 4)
-
-def generate_epc(upc, serial_number):
-    gs1_company_prefix = "0" + upc[:6]
-    item_reference_number = upc[6:11]
-    gtin14 = "0" + gs1_company_prefix + item_reference_number
-    header = "00110000"
-    filter_value = "001"
-    partition = "101"
-    gs1_binary = dec_to_bin(gs1_company_prefix, 24)
-    item_reference_binary = dec_to_bin(item_reference_number, 20)
-    serial_binary = dec_to_bin(serial_number, 38)
-    epc_binary = header + filter_value + partition + gs1_binary + item_reference_binary + serial_binary
-    epc_hex = bin_to_hex(epc_binary)
-    return epc_hex
-
 def open_roll_tracker(upc, start_serial, end_serial, lpr, total_qty, qty_db):
     try:
         roll_tracker_path = os.path.join(os.path.dirname(__file__), 'Roll Tracker v.3.xlsx')
         if not os.path.exists(roll_tracker_path):
             messagebox.showerror("File Error", f"Roll Tracker file not found at: {roll_tracker_path}")
             return
-        wb = openpyxl.load_workbook(roll_tracker_path)
-        input_sheet = wb['Input']
-        input_sheet['D3'] = lpr
-        input_sheet['D4'] = total_qty
-        input_sheet['D5'] = start_serial
-        input_sheet['D8'] = end_serial
-        input_sheet['D10'] = qty_db
-        hex_sheet = wb['HEX']
-        wb.active = wb.index(hex_sheet)
-        temp_path = os.path.join(os.path.dirname(__file__), 'temp_Roll_Tracker.xlsx')
-        wb.save(temp_path)
-        os.startfile(temp_path)
+        # Patches the Input cells inside the xlsx directly, leaving the formulas and formatting untouched
+        output_path = fill_roll_tracker(roll_tracker_path, upc, start_serial, end_serial, lpr, total_qty, qty_db)
+        os.startfile(output_path)
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
+def selected_encoding():
+    """ (scheme, partition, filter) picked in the Encoding row """
+    return scheme_menu.get(), int(partition_menu.get()), int(filter_menu.get())
+
 def validate_upc(upc):
-    if (len(upc) != 12) or (not upc.isdigit()):
-        messagebox.showerror("Input Error", "UPC must be exactly 12 digits.")
+    try:
+        epc_template(upc, *selected_encoding())
+    except ValueError as e:
+        messagebox.showerror("Input Error", str(e))
         return False
     return True
 
 def calculate_total_quantity():
     try:
-        total_qty = int(total_qty_entry.get())
-        if var_2_percent.get():
-            total_qty += total_qty * 0.02
-        if var_7_percent.get():
-            total_qty += total_qty * 0.07
-        return int(total_qty)
+        return apply_overage(int(total_qty_entry.get()), var_2_percent.get(), var_7_percent.get())
     except ValueError:
         return 0
 
@@ -131,51 +128,169 @@ def generate_file():
         messagebox.showerror("Input Error", "Serial numbers and quantities must be integers.")
         return
 
+    if total_qty <= 0 or lpr <= 0 or qty_db <= 0:
+        messagebox.showerror("Input Error", "LPR, total quantity and Qty/DB must be greater than zero.")
+        return
+
     end_serial = start_serial + total_qty - 1
-    num_serials = end_serial - start_serial + 1
-    num_dbs = math.ceil(num_serials / qty_db)
-    
+    resume = False
+    previous_run = resumable_progress(save_location, upc, start_serial, end_serial, qty_db, selected_encoding(), db_format_menu.get())
+    if previous_run and previous_run[0]:
+        resume = messagebox.askyesno(
+            "Resume Job",
+            f"{previous_run[0]} of {previous_run[1]} DB files from an earlier run of this job are already in {save_location}.\n\n"
+            "Resume and only write the missing or damaged DB files?",
+        )
+
+    phases = {}
     try:
-        progress_bar['maximum'] = num_dbs
-        for db_index in range(num_dbs):
-            chunk_start = start_serial + db_index * qty_db
-            chunk_end = min(chunk_start + qty_db - 1, end_serial)
-            chunk_serial_numbers = list(range(chunk_start, chunk_end + 1))
-            epc_values = [generate_epc(upc, sn) for sn in chunk_serial_numbers]
-
-            df = pd.DataFrame({
-                'UPC': [upc] * len(chunk_serial_numbers),
-                'Serial #': chunk_serial_numbers,
-                'EPC': epc_values
-            })
-
-            start_range = (chunk_start // 1000) + 1 if chunk_start % 1000 == 0 else (chunk_start // 1000)
-            end_range = ((chunk_end + 1) // 1000)
-            file_name = f"{upc}.DB{db_index + 1}.{start_range}K-{end_range}K.xlsx"
-            file_path = os.path.join(save_location, file_name)
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Sheet1')
-                worksheet = writer.sheets['Sheet1']
-                worksheet.column_dimensions['C'].width = 40
-
-            progress_bar['value'] = db_index + 1
-            root.update_idletasks()
-
-        open_roll_tracker(upc, start_serial, end_serial, lpr, total_qty, qty_db)
-        messagebox.showinfo("Success", f"Files saved successfully in: {save_location}")
+        with timed(phases, 'ledger_check'):
+            overlaps = find_overlaps(upc, start_serial, end_serial)
     except Exception as e:
-        messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        overlaps = []
+        messagebox.showwarning("Serial Ledger", f"Could not check the serial ledger: {str(e)}")
+    if resume:
+        # A finished run of this same job is already in the ledger
+        overlaps = [o for o in overlaps if os.path.normpath(o['job_folder']) != os.path.normpath(save_location)]
+    if overlaps and not messagebox.askyesno(
+        "Serial Overlap",
+        f"Serials {start_serial}-{end_serial} for UPC {upc} overlap earlier job(s):\n\n{describe_overlaps(overlaps)}\n\n"
+        "Generating anyway will produce duplicate EPCs. Continue?",
+    ):
+        return
+
+    chunks = list(db_chunks(start_serial, end_serial, qty_db))
+    job = {
+        'upc': upc,
+        'start_serial': start_serial,
+        'end_serial': end_serial,
+        'lpr': lpr,
+        'total_qty': total_qty,
+        'qty_db': qty_db,
+        'save_location': save_location,
+        'encoding': selected_encoding(),
+        'db_format': db_format_menu.get(),
+        'parallel': var_parallel.get(),
+        'staging': var_staging.get(),
+        'resume': resume,
+        'phases': phases,
+        'started': time.monotonic(),
+    }
+
+    # Drop anything left over from a previous job before starting the worker
+    while not generation_queue.empty():
+        generation_queue.get_nowait()
+    cancel_event.clear()
+
+    progress_bar['maximum'] = len(chunks)
+    progress_bar['value'] = 0
+    throughput_label.config(text="Starting...")
+    generate_button.config(state=tk.DISABLED)
+    cancel_button.config(state=tk.NORMAL)
+
+    threading.Thread(target=run_generation, args=(job, var_parallel.get(), resume, var_staging.get()), daemon=True).start()
+    root.after(100, poll_generation_queue, job)
+
+def run_generation(job, parallel, resume, staging):
+    """ Worker thread: runs the engine and reports back through generation_queue, never touches Tk """
+    try:
+        with timed(job['phases'], 'generate'):
+            written = generate_database(
+                job['upc'], job['start_serial'], job['end_serial'], job['qty_db'], job['save_location'], parallel=parallel,
+                progress=lambda dbs_done, labels_done: generation_queue.put(('progress', dbs_done, labels_done)),
+                cancel_event=cancel_event, resume=resume, staging_dir=STAGING_PATH if staging else None, encoding=job['encoding'],
+                db_format=job['db_format'],
+            )
+        roll_plan_path = os.path.join(job['save_location'], roll_plan_file_name(job['upc'], job['start_serial'], job['end_serial']))
+        with timed(job['phases'], 'roll_plan'):
+            write_roll_plan(roll_plan_path, job['upc'], job['start_serial'], job['end_serial'], job['lpr'], job['qty_db'], job['encoding'],
+                            job['db_format'])
+        if job['db_format'] != 'xlsx':
+            roll_index_path = os.path.join(job['save_location'], roll_index_file_name(job['upc'], job['start_serial'], job['end_serial']))
+            with timed(job['phases'], 'roll_index'):
+                write_roll_index(roll_index_path, job['upc'], job['start_serial'], job['end_serial'], job['lpr'], job['qty_db'], job['encoding'])
+        generation_queue.put(('done', len(written)))
+    except GenerationCancelled as e:
+        generation_queue.put(('cancelled', e.removed))
+    except Exception as e:
+        generation_queue.put(('error', str(e)))
+
+def poll_generation_queue(job):
+    try:
+        while True:
+            message = generation_queue.get_nowait()
+            if message[0] == 'progress':
+                _, dbs_done, labels_done = message
+                progress_bar['value'] = dbs_done
+                elapsed = time.monotonic() - job['started']
+                rate = labels_done / elapsed if elapsed > 0 else 0
+                remaining = (job['total_qty'] - labels_done) / rate if rate else 0
+                throughput_label.config(text=f"{rate:,.0f} labels/sec - ETA {datetime.timedelta(seconds=int(remaining))}")
+            else:
+                finish_generation(job, message)
+                return
+    except queue.Empty:
+        pass
+    root.after(100, poll_generation_queue, job)
+
+def log_generation(job, status, error=None):
+    manifest = load_job_manifest(job_manifest_path(job['save_location'], job['upc'], job['start_serial'], job['end_serial']))
+    append_job_record(generation_record(job, status, time.monotonic() - job['started'], job['phases'], manifest, source='gui',
+                                        parallel=job['parallel'], staging=job['staging'], resume=job['resume'], db_format=job['db_format'],
+                                        error=error))
+
+def finish_generation(job, message):
+    generate_button.config(state=tk.NORMAL)
+    cancel_button.config(state=tk.DISABLED)
+    if message[0] == 'done':
+        throughput_label.config(text=f"Done in {datetime.timedelta(seconds=int(time.monotonic() - job['started']))}")
+        try:
+            with timed(job['phases'], 'ledger_record'):
+                record_range(job['upc'], job['start_serial'], job['end_serial'], job['save_location'])
+        except Exception as e:
+            messagebox.showwarning("Serial Ledger", f"The job was not recorded in the serial ledger: {str(e)}")
+        with timed(job['phases'], 'roll_tracker'):
+            open_roll_tracker(job['upc'], job['start_serial'], job['end_serial'], job['lpr'], job['total_qty'], job['qty_db'])
+        log_generation(job, 'done')
+        messagebox.showinfo("Success", f"Files saved successfully in: {job['save_location']}")
+    elif message[0] == 'cancelled':
+        throughput_label.config(text="Cancelled")
+        log_generation(job, 'cancelled')
+        messagebox.showinfo("Cancelled", f"Generation cancelled, {message[1]} partial DB file(s) removed.")
+    else:
+        throughput_label.config(text="Failed")
+        log_generation(job, 'failed', message[1])
+        messagebox.showerror("Error", f"An error occurred: {message[1]}")
+
+def cancel_generation():
+    cancel_event.set()
+    cancel_button.config(state=tk.DISABLED)
+    throughput_label.config(text="Cancelling after the current DB...")
+
+def fill_next_free_serial():
+    upc = upc_entry.get().strip()
+    if not validate_upc(upc):
+        return
+    try:
+        serial = next_free_serial(upc)
+    except Exception as e:
+        messagebox.showerror("Serial Ledger", f"Could not read the serial ledger: {str(e)}")
+        return
+    serial_start_entry.delete(0, tk.END)
+    serial_start_entry.insert(0, str(serial))
 
 def on_checkbox_change():
     total_qty = calculate_total_quantity()
     total_quantity_label.config(text=f"Updated Total Quantity: {total_qty}")
 
+PREVIEW_ROWS = 20
+
 def preview_file():
     upc = upc_entry.get().strip()
     start_serial = serial_start_entry.get().strip()
-    total_qty = total_qty_entry.get().strip()
     lpr = lpr_entry.get().strip()
     qty_db = qty_db_entry.get().strip()
+    total_qty = calculate_total_quantity()
 
     if not upc or not start_serial or not lpr or not total_qty or not qty_db:
         messagebox.showerror("Input Error", "All fields are required.")
@@ -193,29 +308,97 @@ def preview_file():
         messagebox.showerror("Input Error", "Serial numbers and quantities must be integers.")
         return
 
-    end_serial = start_serial + total_qty - 1
-    chunk_serial_numbers = list(range(start_serial, min(start_serial + 10, end_serial + 1)))
-    epc_values = [generate_epc(upc, sn) for sn in chunk_serial_numbers]
+    if lpr <= 0 or qty_db <= 0:
+        messagebox.showerror("Input Error", "LPR and Qty/DB must be greater than zero.")
+        return
 
-    df = pd.DataFrame({
-        'UPC': [upc] * len(chunk_serial_numbers),
-        'Serial #': chunk_serial_numbers,
-        'EPC': epc_values
-    })
+    end_serial = start_serial + total_qty - 1
+    encoding = selected_encoding()
+    # Only the visible rows exist in the table; scrolling re-encodes the window at the new offset
+    view = {'offset': 0}
+    last_offset = max(total_qty - PREVIEW_ROWS, 0)
 
     preview_window = tk.Toplevel(root)
-    preview_window.title("Preview Data")
-    preview_window.geometry("600x400")
-
-    preview_table = ttk.Treeview(preview_window, columns=("UPC", "Serial #", "EPC"), show="headings")
-    preview_table.heading("UPC", text="UPC")
-    preview_table.heading("Serial #", text="Serial #")
-    preview_table.heading("EPC", text="EPC")
-
-    for index, row in df.iterrows():
-        preview_table.insert("", "end", values=(row["UPC"], row["Serial #"], row["EPC"]))
-
-    preview_table.pack(expand=True, fill="both")
+    preview_window.title(f"Preview Data - {total_qty:,} labels, serials {start_serial}-{end_serial}")
+    preview_window.geometry("760x520")
+
+    jump_frame = tk.Frame(preview_window)
+    jump_frame.pack(fill="x", padx=10, pady=5)
+    tk.Label(jump_frame, text="Jump to:").pack(side="left")
+    jump_kind = ttk.Combobox(jump_frame, values=("Serial #", "DB #", "Roll #"), state="readonly", width=10)
+    jump_kind.set("Serial #")
+    jump_kind.pack(side="left", padx=5)
+    jump_entry = tk.Entry(jump_frame, width=16)
+    jump_entry.pack(side="left", padx=5)
+    position_label = tk.Label(jump_frame, text="")
+    position_label.pack(side="right")
+
+    table_frame = tk.Frame(preview_window)
+    table_frame.pack(expand=True, fill="both", padx=10, pady=5)
+    columns = ("Roll #", "DB #", "UPC", "Serial #", "EPC")
+    preview_table = ttk.Treeview(table_frame, columns=columns, show="headings", height=PREVIEW_ROWS)
+    for column, width in zip(columns, (70, 60, 120, 120, 240)):
+        preview_table.heading(column, text=column)
+        preview_table.column(column, width=width, anchor="center")
+    scrollbar = ttk.Scrollbar(table_frame, orient="vertical")
+    scrollbar.pack(side="right", fill="y")
+    preview_table.pack(side="left", expand=True, fill="both")
+
+    def show(offset):
+        view['offset'] = min(max(int(offset), 0), last_offset)
+        preview_table.delete(*preview_table.get_children())
+        for row in preview_rows(upc, start_serial, end_serial, lpr, qty_db, view['offset'], PREVIEW_ROWS, encoding):
+            preview_table.insert("", "end", values=row)
+        shown = min(PREVIEW_ROWS, total_qty)
+        scrollbar.set(view['offset'] / total_qty, (view['offset'] + shown) / total_qty)
+        position_label.config(text=f"Rows {view['offset'] + 1:,}-{view['offset'] + shown:,} of {total_qty:,}")
+
+    def on_scroll(action, amount, unit=None):
+        if action == "moveto":
+            show(float(amount) * total_qty)
+        elif action == "scroll":
+            step = PREVIEW_ROWS if unit == "pages" else 1
+            show(view['offset'] + int(amount) * step)
+
+    def on_wheel(event):
+        if event.num == 4 or event.delta > 0:
+            show(view['offset'] - 3)
+        else:
+            show(view['offset'] + 3)
+        return "break"
+
+    def jump():
+        try:
+            target = int(jump_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Input Error", "Enter a whole number to jump to.", parent=preview_window)
+            return
+        if jump_kind.get() == "Serial #":
+            index = target - start_serial
+        elif jump_kind.get() == "DB #":
+            index = (target - 1) * qty_db
+        else:
+            index = (target - 1) * lpr
+        if index < 0 or index >= total_qty:
+            messagebox.showerror("Input Error", f"{jump_kind.get()} {target} is not in this job.", parent=preview_window)
+            return
+        show(index)
+        # Highlight the row that was jumped to
+        children = preview_table.get_children()
+        if children:
+            preview_table.selection_set(children[index - view['offset']])
+
+    tk.Button(jump_frame, text="Go", command=jump).pack(side="left", padx=5)
+    jump_entry.bind("<Return>", lambda event: jump())
+    scrollbar.config(command=on_scroll)
+    preview_table.bind("<MouseWheel>", on_wheel)
+    preview_table.bind("<Button-4>", on_wheel)
+    preview_table.bind("<Button-5>", on_wheel)
+    preview_window.bind("<Prior>", lambda event: show(view['offset'] - PREVIEW_ROWS))
+    preview_window.bind("<Next>", lambda event: show(view['offset'] + PREVIEW_ROWS))
+    preview_window.bind("<Home>", lambda event: show(0))
+    preview_window.bind("<End>", lambda event: show(last_offset))
+    show(0)
 
 def verify_epc():
     upc = upc_entry.get().strip()
@@ -234,27 +417,130 @@ def verify_epc():
         messagebox.showerror("Input Error", "Serial numbers must be integers.")
         return
 
-    epc = generate_epc(upc, start_serial)
-    epc_url = "https://www.gs1.org/services/epc-encoderdecoder"
-
+    scheme, partition, filter_value = selected_encoding()
     try:
-        # Initialize the WebDriver (assuming ChromeDriver is in your PATH)
-        driver = webdriver.Chrome()
-        driver.get(epc_url)
+        epc = encode_epc(epc_template(upc, scheme, partition, filter_value), start_serial)
+        decoded = decode_epc(epc)
+    except ValueError as e:
+        messagebox.showerror("Error", f"An error occurred while verifying the EPC: {str(e)}")
+        return
 
-        # Wait for the page to load
-        driver.implicitly_wait(10)
+    details = (
+        f"EPC: {epc}\n\n"
+        f"Header: {decoded['header']:#04x} ({decoded['scheme'].upper()})\n"
+        f"Filter: {decoded['filter']}\n"
+        f"Partition: {decoded['partition']}\n"
+        f"Company Prefix: {decoded['company_prefix']}\n"
+    )
+    if scheme == 'sscc-96':
+        details += f"Serial Reference: {decoded['serial_reference']}\nSSCC: {decoded['sscc']}\n"
+        round_trip = decoded['sscc'].startswith(upc) and decoded['serial'] == start_serial
+        expected_code = None
+    else:
+        details += f"Item Reference: {decoded['item_reference']}\nGTIN-14: {decoded['gtin14']}\n"
+        expected_code = normalize_gtin(upc)
+        round_trip = decoded['gtin14'][:13] == expected_code[:13] and str(decoded['serial']) == str(start_serial)
+    details += f"Serial: {decoded['serial']}\n\n"
+    if not round_trip:
+        messagebox.showerror("Verify EPC", details + "MISMATCH: the EPC does not decode back to this UPC and serial.")
+    elif expected_code and decoded['gtin14'] != expected_code:
+        messagebox.showwarning("Verify EPC", details + f"Round-trip OK, but the UPC check digit should be {decoded['gtin14'][-1]}.")
+    else:
+        messagebox.showinfo("Verify EPC", details + "Round-trip OK.")
 
-        # Locate the input field by its identifier and fill in the EPC value
-        epc_input_field = driver.find_element(By.XPATH, '//*[@id="epcContainer"]/table/tbody/tr/td/div/div[5]/input')
-        epc_input_field.send_keys(epc)
+def verify_job_folder():
+    folder = save_location_entry.get().strip() or filedialog.askdirectory()
+    if not folder:
+        return
+    if not os.path.isdir(folder):
+        messagebox.showerror("Directory Error", f"Directory does not exist: {folder}")
+        return
+    verify_button.config(state=tk.DISABLED)
+    throughput_label.config(text=f"Verifying DB files in {folder}...")
+    threading.Thread(target=lambda: verify_queue.put(run_verify_job(folder)), daemon=True).start()
+    root.after(100, poll_verify_queue, folder, time.monotonic())
 
+def run_verify_job(folder):
+    try:
+        return verify_job(folder)
     except Exception as e:
-        messagebox.showerror("Error", f"An error occurred while verifying the EPC: {str(e)}")
-    finally:
-        # Optionally, close the WebDriver after some time or leave it open for manual interaction
-        # driver.quit()
-        pass
+        return e
+
+def poll_verify_queue(folder, started):
+    try:
+        report = verify_queue.get_nowait()
+    except queue.Empty:
+        root.after(100, poll_verify_queue, folder, started)
+        return
+    verify_button.config(state=tk.NORMAL)
+    elapsed = time.monotonic() - started
+    if isinstance(report, Exception):
+        throughput_label.config(text="Verify failed")
+        messagebox.showerror("Error", f"An error occurred while verifying the job: {str(report)}")
+        return
+    throughput_label.config(text=f"Verified {report['rows']:,} rows in {elapsed:.1f}s")
+    ranges = "\n".join(f"{upc}: serials {first}-{last}" for upc, (first, last) in sorted(report['ranges'].items()))
+    summary = f"{report['files']} DB file(s), {report['rows']:,} EPC(s) checked\n{ranges}"
+    if report['files'] == 0:
+        messagebox.showwarning("Verify Job", f"No DB files found in: {folder}")
+    elif report['errors']:
+        listed = "\n".join(report['issues'][:20])
+        messagebox.showerror("Verify Job", f"{summary}\n\n{report['errors']} problem(s) found:\n{listed}")
+    else:
+        messagebox.showinfo("Verify Job", f"{summary}\n\nEvery EPC round-trips and the ranges are contiguous.")
+
+def show_stats():
+    """ Recent jobs from the job log; anything at under half the usual speed of its kind is highlighted """
+    records = recent_jobs(200)
+    stats_window = tk.Toplevel(root)
+    stats_window.title("Job Stats")
+    stats_window.geometry("1000x480")
+
+    columns = ("When", "Kind", "Job", "Labels", "Seconds", "Labels/sec", "Encode s", "Write s", "MB", "Status", "Machine")
+    stats_table = ttk.Treeview(stats_window, columns=columns, show="headings")
+    for column, width in zip(columns, (130, 90, 240, 80, 70, 85, 70, 70, 60, 70, 100)):
+        stats_table.heading(column, text=column)
+        stats_table.column(column, width=width, anchor="center")
+    stats_table.tag_configure('slow', background="#FFCDD2")
+    scrollbar = ttk.Scrollbar(stats_window, orient="vertical", command=stats_table.yview)
+    stats_table.configure(yscrollcommand=scrollbar.set)
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2] if values else None
+
+    usual_rate = median([r['labels_per_sec'] for r in records if r.get('kind') == 'generate' and r.get('labels_per_sec')])
+    usual_seconds = {kind: median([r['seconds'] for r in records if r.get('kind') == kind and r.get('status') == 'done'])
+                     for kind in ('index_refresh', 'job_folder', 'batch_jobs')}
+    slow_count = 0
+    for record in records:
+        kind = record.get('kind', '')
+        if kind == 'generate':
+            job = f"{record['upc']} {record['start_serial']}-{record['end_serial']}"
+            slow = bool(usual_rate and record.get('labels_per_sec') and record['labels_per_sec'] < usual_rate / 2)
+        else:
+            job = record.get('upc') or record.get('orders') or (f"{record['customers']} customers" if 'customers' in record else '')
+            usual = usual_seconds.get(kind)
+            slow = bool(usual and record.get('status') == 'done' and record.get('seconds', 0) > usual * 2 and record['seconds'] > 1)
+        slow_count += slow
+        stats_table.insert("", "end", tags=('slow',) if slow else (), values=(
+            record.get('logged_at', '').replace('T', ' '), kind, job,
+            f"{record['total_qty']:,}" if 'total_qty' in record else '',
+            record.get('seconds', ''),
+            f"{record['labels_per_sec']:,}" if record.get('labels_per_sec') else '',
+            record.get('encode_seconds', ''), record.get('write_seconds', ''),
+            f"{record['bytes'] / 1048576:.1f}" if record.get('bytes') else '',
+            record.get('status', ''), record.get('machine', ''),
+        ))
+
+    summary = f"{len(records)} recent job(s)"
+    if usual_rate:
+        summary += f", usual generation speed {usual_rate:,} labels/sec"
+    if slow_count:
+        summary += f", {slow_count} slow (highlighted)"
+    tk.Label(stats_window, text=summary, font=("Helvetica", 11)).pack(side="top", pady=5)
+    scrollbar.pack(side="right", fill="y")
+    stats_table.pack(expand=True, fill="both", padx=10, pady=5)
 
 def clear_fields():
     customer_menu.set('')
@@ -264,28 +550,60 @@ def clear_fields():
     upc_entry_job.delete(0, tk.END)
 
 def populate_customer_dropdown():
-    customer_dir = base_path
-    if os.path.exists(customer_dir):
-        customers = os.listdir(customer_dir)
-        customers = [customer for customer in customers if os.path.isdir(os.path.join(customer_dir, customer))]
+    """ Fill the dropdowns from the cached directory index, then refresh the index from the share in the background """
+    global directory_cache
+    directory_cache = directory_index.load_index()
+    if directory_cache and directory_cache.get('base_path') == base_path:
+        show_customers()
+    threading.Thread(target=lambda: index_queue.put(run_index_refresh()), daemon=True).start()
+    root.after(200, poll_index_queue)
+
+def run_index_refresh():
+    started = time.monotonic()
+    try:
+        index = directory_index.refresh_index(base_path, template_base_path)
+    except Exception as e:
+        append_job_record({'kind': 'index_refresh', 'status': 'failed', 'seconds': round(time.monotonic() - started, 3), 'error': str(e)})
+        return e
+    # Listing latency of the share, the first thing to look at when the Job Creator feels slow
+    append_job_record({'kind': 'index_refresh', 'status': 'done', 'seconds': round(time.monotonic() - started, 3),
+                       'customers': len(directory_index.customers(index))})
+    return index
+
+def poll_index_queue():
+    global directory_cache
+    try:
+        index = index_queue.get_nowait()
+    except queue.Empty:
+        root.after(200, poll_index_queue)
+        return
+    if isinstance(index, Exception):
+        if not directory_cache:
+            messagebox.showerror("Directory Error", f"Customer directory not found: {base_path}")
+        return
+    directory_cache = index
+    show_customers()
+
+def show_customers():
+    customers = directory_index.customers(directory_cache)
+    customer_menu['values'] = customers
+    if customer_var.get() not in customers:
         customer_var.set(customers[0] if customers else '')
-        customer_menu['values'] = customers
-        update_label_size_dropdown(customers[0])
-    else:
-        messagebox.showerror("Directory Error", f"Customer directory not found: {customer_dir}")
+    if customer_var.get():
+        update_label_size_dropdown(customer_var.get())
 
 def update_label_size_dropdown(customer):
-    label_size_dir = os.path.join(base_path, customer)
-    if os.path.exists(label_size_dir):
-        label_sizes = os.listdir(label_size_dir)
-        label_sizes = [size for size in label_sizes if os.path.isdir(os.path.join(label_size_dir, size))]
-        label_size_var.set(label_sizes[0] if label_sizes else '')
+    label_sizes = directory_index.label_sizes(directory_cache, customer)
+    if label_sizes is not None:
+        if label_size_var.get() not in label_sizes:
+            label_size_var.set(label_sizes[0] if label_sizes else '')
         label_size_menu['values'] = label_sizes
     else:
         messagebox.showerror("Directory Error", f"Label size directory not found for customer: {customer}")
 
 def on_customer_select(event):
     selected_customer = customer_var.get()
+    label_size_var.set('')
     update_label_size_dropdown(selected_customer)
 
 def create_job_folder():
@@ -303,8 +621,15 @@ def create_job_folder():
     # Construct the template path
     template_path = os.path.join(template_base_path, customer, label_size, f"Template {label_size}.btw")
 
-    if not os.path.exists(template_path):
-        messagebox.showerror("Template Error", f"Template not found at {template_path}")
+    phases = {}
+    started = time.monotonic()
+    job_record = {'kind': 'job_folder', 'customer': customer, 'label_size': label_size, 'upc': upc, 'phases': phases}
+    with timed(phases, 'template_check'):
+        template_found = os.path.exists(template_path)
+    if not template_found:
+        available = directory_index.templates(directory_cache, customer, label_size)
+        hint = f"\n\nTemplates in that folder: {', '.join(available)}" if available else ""
+        messagebox.showerror("Template Error", f"Template not found at {template_path}{hint}")
         return
 
     today_date = datetime.datetime.now().strftime("%m.%d.%y")
@@ -314,17 +639,81 @@ def create_job_folder():
     job_data_folder_path = os.path.join(upc_folder_path, "data")
 
     try:
-        os.makedirs(upc_folder_path, exist_ok=True)
-        os.makedirs(os.path.join(upc_folder_path, "print"), exist_ok=True)
-        os.makedirs(job_data_folder_path, exist_ok=True)
+        with timed(phases, 'makedirs'):
+            os.makedirs(upc_folder_path, exist_ok=True)
+            os.makedirs(os.path.join(upc_folder_path, "print"), exist_ok=True)
+            os.makedirs(job_data_folder_path, exist_ok=True)
         
         # Copy the constructed template path to the print folder and rename it to the UPC
-        shutil.copy(template_path, os.path.join(upc_folder_path, "print", f"{upc}.btw"))
+        with timed(phases, 'template_copy'):
+            shutil.copy(template_path, os.path.join(upc_folder_path, "print", f"{upc}.btw"))
         print(f"Template copied to {os.path.join(upc_folder_path, 'print', f'{upc}.btw')}")
+        append_job_record(dict(job_record, status='done', seconds=round(time.monotonic() - started, 3), bytes=os.path.getsize(template_path)))
         messagebox.showinfo("Success", f"Folder created successfully at: {upc_folder_path}")
     except Exception as e:
+        append_job_record(dict(job_record, status='failed', seconds=round(time.monotonic() - started, 3), error=str(e)))
         messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
+def batch_create_jobs():
+    orders_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
+    if not orders_path:
+        return
+    if not directory_cache:
+        messagebox.showerror("Directory Error", f"The customer directory has not been loaded yet: {base_path}")
+        return
+    try:
+        orders = read_orders(orders_path)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Input Error", str(e))
+        return
+
+    # Everything is checked against the cached index before a single folder is created
+    valid, problems = validate_orders(orders, directory_cache)
+    if problems:
+        listed = "\n".join(problems[:20]) + (f"\n...and {len(problems) - 20} more" if len(problems) > 20 else "")
+        if not valid:
+            messagebox.showerror("Batch Job Creator", f"None of the {len(orders)} order(s) can be created:\n\n{listed}")
+            return
+        if not messagebox.askyesno("Batch Job Creator", f"{len(problems)} of {len(orders)} order(s) will be skipped:\n\n{listed}\n\nCreate the other {len(valid)}?"):
+            return
+
+    batch_button.config(state=tk.DISABLED)
+    threading.Thread(target=lambda: batch_queue.put(run_batch(valid)), daemon=True).start()
+    root.after(100, poll_batch_queue, orders_path, problems, time.monotonic())
+
+def run_batch(orders):
+    try:
+        return create_jobs(orders, base_path, template_base_path)
+    except Exception as e:
+        return e
+
+def poll_batch_queue(orders_path, problems, started):
+    try:
+        results = batch_queue.get_nowait()
+    except queue.Empty:
+        root.after(100, poll_batch_queue, orders_path, problems, started)
+        return
+    batch_button.config(state=tk.NORMAL)
+    if isinstance(results, Exception):
+        messagebox.showerror("Error", f"An error occurred: {str(results)}")
+        return
+    created = [result for result in results if result['status'] == 'created']
+    failed = [result for result in results if result['status'] != 'created']
+    append_job_record({'kind': 'batch_jobs', 'status': 'done' if not failed else 'failed', 'orders': orders_path,
+                       'created': len(created), 'failed': len(failed), 'skipped': len(problems),
+                       'seconds': round(time.monotonic() - started, 3)})
+    try:
+        report_path = write_report(os.path.splitext(orders_path)[0] + " report.csv", results, problems)
+        report_line = f"\n\nReport saved to: {report_path}"
+    except OSError as e:
+        report_line = f"\n\nThe report could not be saved: {str(e)}"
+    summary = f"{len(created)} job folder(s) created, {len(failed)} failed, {len(problems)} skipped.{report_line}"
+    if failed:
+        listed = "\n".join(f"Line {result['line']} ({result['upc']}): {result['message']}" for result in failed[:10])
+        messagebox.showwarning("Batch Job Creator", f"{summary}\n\n{listed}")
+    else:
+        messagebox.showinfo("Batch Job Creator", summary)
+
 def create_database_generator_tab(tab):
     header_frame = tk.Frame(tab, bg="#004B87")
     header_frame.grid(row=0, column=0, columnspan=3, sticky="ew")
@@ -334,7 +723,7 @@ def create_database_generator_tab(tab):
     input_frame = tk.Frame(tab)
     input_frame.grid(row=1, column=0, columnspan=3, padx=10, pady=10)
 
-    tk.Label(input_frame, text="UPC:", font=("Helvetica", 12)).grid(row=0, column=0, sticky="e", padx=10, pady=10)
+    tk.Label(input_frame, text="UPC / GTIN:", font=("Helvetica", 12)).grid(row=0, column=0, sticky="e", padx=10, pady=10)
     global upc_entry
     upc_entry = tk.Entry(input_frame, font=("Helvetica", 12))
     upc_entry.grid(row=0, column=1, sticky="ew", padx=10, pady=10)
@@ -344,6 +733,7 @@ def create_database_generator_tab(tab):
     global serial_start_entry
     serial_start_entry = tk.Entry(input_frame, font=("Helvetica", 12))
     serial_start_entry.grid(row=1, column=1, sticky="ew", padx=10, pady=10)
+    tk.Button(input_frame, text="Next Free", command=fill_next_free_serial, font=("Helvetica", 12), bg="#004B87", fg="white").grid(row=1, column=2, padx=10, pady=10)
 
     tk.Label(input_frame, text="Labels per Roll (LPR):", font=("Helvetica", 12)).grid(row=2, column=0, sticky="e", padx=10, pady=10)
     global lpr_entry
@@ -366,34 +756,84 @@ def create_database_generator_tab(tab):
     save_location_entry.grid(row=5, column=1, sticky="ew", padx=10, pady=10)
     tk.Button(input_frame, text="Browse...", command=select_save_location, font=("Helvetica", 12), bg="#004B87", fg="white").grid(row=5, column=2, padx=10, pady=10)
 
+    # EPC scheme, GS1 partition (company prefix length) and filter value; the defaults are the classic SGTIN-96 jobs
+    tk.Label(input_frame, text="Encoding:", font=("Helvetica", 12)).grid(row=6, column=0, sticky="e", padx=10, pady=10)
+    encoding_frame = tk.Frame(input_frame)
+    encoding_frame.grid(row=6, column=1, columnspan=2, sticky="w", padx=10, pady=10)
+    default_scheme, default_partition, default_filter = DEFAULT_ENCODING
+    global scheme_menu, partition_menu, filter_menu
+    scheme_menu = ttk.Combobox(encoding_frame, values=list(EPC_SCHEMES), state="readonly", width=10)
+    scheme_menu.set(default_scheme)
+    scheme_menu.pack(side="left")
+    tk.Label(encoding_frame, text="Partition:").pack(side="left", padx=(10, 2))
+    partition_menu = ttk.Combobox(encoding_frame, values=list(SGTIN_PARTITIONS), state="readonly", width=3)
+    partition_menu.set(default_partition)
+    partition_menu.pack(side="left")
+    tk.Label(encoding_frame, text="Filter:").pack(side="left", padx=(10, 2))
+    filter_menu = ttk.Combobox(encoding_frame, values=list(range(8)), state="readonly", width=3)
+    filter_menu.set(default_filter)
+    filter_menu.pack(side="left")
+    # xlsx DB files, BarTender text databases with a roll index, or both
+    tk.Label(encoding_frame, text="DB Format:").pack(side="left", padx=(10, 2))
+    global db_format_menu
+    db_format_menu = ttk.Combobox(encoding_frame, values=list(DB_FORMATS), state="readonly", width=5)
+    db_format_menu.set(DB_FORMATS[0])
+    db_format_menu.pack(side="left")
+
     # Checkboxes for 2% and 7%
     global var_2_percent, var_7_percent
     var_2_percent = tk.BooleanVar()
     var_7_percent = tk.BooleanVar()
     checkbox_2_percent = tk.Checkbutton(input_frame, text="2%", variable=var_2_percent, command=on_checkbox_change)
     checkbox_7_percent = tk.Checkbutton(input_frame, text="7%", variable=var_7_percent, command=on_checkbox_change)
-    checkbox_2_percent.grid(row=6, column=0, padx=10, pady=5)
-    checkbox_7_percent.grid(row=6, column=1, padx=10, pady=5)
+    checkbox_2_percent.grid(row=7, column=0, padx=10, pady=5)
+    checkbox_7_percent.grid(row=7, column=1, padx=10, pady=5)
+
+    # Spread DB files across all CPU cores
+    global var_parallel
+    var_parallel = tk.BooleanVar(value=True)
+    checkbox_parallel = tk.Checkbutton(input_frame, text="Parallel", variable=var_parallel)
+    checkbox_parallel.grid(row=7, column=2, padx=10, pady=5)
+
+    # Write DB files to local disk first and move them to the share in the background
+    global var_staging
+    var_staging = tk.BooleanVar(value=True)
+    checkbox_staging = tk.Checkbutton(input_frame, text="Local Staging", variable=var_staging)
+    checkbox_staging.grid(row=8, column=2, padx=10, pady=5)
 
     # Label to show updated total quantity
     global total_quantity_label
     total_quantity_label = tk.Label(input_frame, text="Updated Total Quantity: 0", font=("Helvetica", 12))
-    total_quantity_label.grid(row=7, column=0, columnspan=2, padx=10, pady=5)
+    total_quantity_label.grid(row=8, column=0, columnspan=2, padx=10, pady=5)
 
     button_frame = tk.Frame(tab)
     button_frame.grid(row=8, column=0, columnspan=3, pady=20)
 
-    tk.Button(button_frame, text="Generate File", command=generate_file, font=("Helvetica", 12), bg="#4CAF50", fg="white").grid(row=0, column=0, padx=10)
+    global generate_button
+    generate_button = tk.Button(button_frame, text="Generate File", command=generate_file, font=("Helvetica", 12), bg="#4CAF50", fg="white")
+    generate_button.grid(row=0, column=0, padx=10)
     tk.Button(button_frame, text="Clear", command=clear_fields, font=("Helvetica", 12), bg="#E60000", fg="white").grid(row=0, column=1, padx=10)
     tk.Button(button_frame, text="Preview", command=preview_file, font=("Helvetica", 12), bg="#FFC107", fg="black").grid(row=0, column=2, padx=10)
     tk.Button(button_frame, text="Verify", command=verify_epc, font=("Helvetica", 12), bg="#2196F3", fg="white").grid(row=0, column=3, padx=10)
+    global verify_button
+    verify_button = tk.Button(button_frame, text="Verify Job", command=verify_job_folder, font=("Helvetica", 12), bg="#2196F3", fg="white")
+    verify_button.grid(row=0, column=4, padx=10)
+    tk.Button(button_frame, text="Stats", command=show_stats, font=("Helvetica", 12), bg="#607D8B", fg="white").grid(row=0, column=5, padx=10)
 
     global progress_bar
     progress_bar = ttk.Progressbar(tab, orient="horizontal", length=400, mode="determinate")
-    progress_bar.grid(row=9, column=0, columnspan=3, pady=10, sticky="ew")
+    progress_bar.grid(row=9, column=0, columnspan=2, pady=10, sticky="ew")
+
+    global cancel_button
+    cancel_button = tk.Button(tab, text="Cancel", command=cancel_generation, font=("Helvetica", 12), bg="#E60000", fg="white", state=tk.DISABLED)
+    cancel_button.grid(row=9, column=2, padx=10, pady=10)
+
+    global throughput_label
+    throughput_label = tk.Label(tab, text="", font=("Helvetica", 10))
+    throughput_label.grid(row=10, column=0, columnspan=3)
 
     footer_frame = tk.Frame(tab, bg="#004B87")
-    footer_frame.grid(row=10, column=0, columnspan=3, sticky="ew")
+    footer_frame.grid(row=11, column=0, columnspan=3, sticky="ew")
     tk.Label(footer_frame, text="Starport Technologies - Converting RFID into the Future", font=("Helvetica", 10), bg="#004B87", fg="white").pack(pady=10)
 
 def create_job_creator_tab(tab):
@@ -440,6 +880,9 @@ def create_job_creator_tab(tab):
 
     tk.Button(button_frame, text="Create Job Folder", command=create_job_folder, font=("Helvetica", 12), bg="#4CAF50", fg="white").grid(row=0, column=0, padx=10)
     tk.Button(button_frame, text="Clear", command=clear_fields, font=("Helvetica", 12), bg="#E60000", fg="white").grid(row=0, column=1, padx=10)
+    global batch_button
+    batch_button = tk.Button(button_frame, text="Batch from CSV...", command=batch_create_jobs, font=("Helvetica", 12), bg="#004B87", fg="white")
+    batch_button.grid(row=0, column=2, padx=10)
 
     footer_frame = tk.Frame(tab, bg="#004B87")
     footer_frame.grid(row=7, column=0, columnspan=3, sticky="ew")
@@ -448,8 +891,6 @@ def create_job_creator_tab(tab):
     tab.rowconfigure(1, weight=1)
     tab.columnconfigure(0, weight=1)
 
-    populate_customer_dropdown()
-
 
 # Main function to initialize the GUI
 def initialize_gui():
@@ -465,16 +906,36 @@ def initialize_gui():
 
     create_job_creator_tab(job_creator_tab)
     create_database_generator_tab(database_generator_tab)
+    root.bind('<Map>', on_first_paint)
+
+def on_first_paint(event):
+    """ Once the window is up, load the dropdowns and start the share refresh, so a slow share never delays the window """
+    if event.widget is not root:
+        return
+    root.unbind('<Map>')
+    # Idle callbacks run in order, so these come after the redraw the window was just queued for
+    root.after_idle(populate_customer_dropdown)
+    if STARTUP_REPORT_FLAG in sys.argv[1:-1]:
+        root.after_idle(report_startup, sys.argv[sys.argv.index(STARTUP_REPORT_FLAG) + 1])
+
+def report_startup(report_path):
+    with open(report_path, 'w') as f:
+        json.dump({'first_paint': time.time()}, f)
+    root.destroy()
+
+if __name__ == '__main__':
+    # Worker processes re-import this module, so the GUI must only start in the main process
+    multiprocessing.freeze_support()
 
-root = tk.Tk()
-root.title("Job Creator and Database Generator")
+    root = tk.Tk()
+    root.title("Job Creator and Database Generator")
 
-# Set icon path relative to script location
-icon_path = resource_path('download.png')
-root.iconphoto(False, tk.PhotoImage(file=icon_path))
+    # Set icon path relative to script location
+    icon_path = resource_path('download.png')
+    root.iconphoto(False, tk.PhotoImage(file=icon_path))
 
-root.resizable(False, False)
+    root.resizable(False, False)
 
-initialize_gui()    
+    initialize_gui()    
 
-root.mainloop()
+    root.mainloop()
@@ -5,12 +5,12 @@ a = Analysis(
     ['UPC2EPC.py'],
     pathex=[],
     binaries=[],
-    datas=[('C:/Users/Jason/OneDrive/Documents/UPC2EPC Convertor/Templates', 'Templates'), ('download.png', '.'), ('Roll Tracker v.3.xlsx', '.'), ('temp_Roll_Tracker.xlsx', '.')],
-    hiddenimports=['openpyxl', 'selenium'],
+    datas=[('download.png', '.'), ('Roll Tracker v.3.xlsx', '.')],
+    hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['pandas', 'numpy', 'openpyxl', 'selenium', 'PIL', 'matplotlib', 'IPython', 'pytest', 'setuptools', 'pydoc', 'unittest'],
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,165 @@
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from epc_engine import (generate_database, generate_epc, generate_epc_batch, preview_rows, verify_job, write_db_delimited,
+                        write_db_xlsx, write_roll_plan)
+from roll_tracker import fill_roll_tracker
+
+BENCHMARK_UPC = '012345678905'
+DEFAULT_QUANTITIES = [10000, 100000, 1000000, 5000000]
+DEFAULT_QTY_DBS = [10000, 100000]
+# generate_epc is the original one-serial-at-a-time encoder; it is only timed on this many labels per quantity
+LEGACY_ENCODE_CAP = 200000
+ROLL_TRACKER_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Roll Tracker v.3.xlsx')
+
+
+# Set from --no-memory; tracing slows Python code down several times, so memory is measured in a second run
+measure_memory = True
+
+def measure(stage, labels, func, **params):
+    """ Time one untraced run of func, then trace a second run for its peak Python memory; returns the result record
+
+    Only memory allocated in this process is traced, so worker processes of a parallel run are not included. """
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    record = dict(params, stage=stage, labels=labels, seconds=round(seconds, 4),
+                  labels_per_sec=round(labels / seconds) if seconds > 0 else None, peak_bytes=peak)
+    print(f"{stage:<22} {labels:>10,} labels {seconds:>9.3f}s {record['labels_per_sec'] or 0:>12,} labels/sec "
+          + (f"{peak / 1048576:>8.1f} MiB peak" if peak is not None else "") + ''.join(f"  {key}={value}" for key, value in params.items()), flush=True)
+    return record
+
+def build_dataframe(count):
+    """ The DataFrame the Database Generator built per DB before the streaming writer; skipped without pandas """
+    import pandas as pd
+    return pd.DataFrame({
+        'UPC': [BENCHMARK_UPC] * count,
+        'Serial #': list(range(1, count + 1)),
+        'EPC': generate_epc_batch(BENCHMARK_UPC, 1, count),
+    })
+
+def run_benchmarks(quantities, qty_dbs, work_dir, parallel=True, legacy_cap=LEGACY_ENCODE_CAP):
+    results = []
+    for total_qty in quantities:
+        legacy_count = min(total_qty, legacy_cap)
+        results.append(measure('encode_per_serial', legacy_count,
+                               lambda: [generate_epc(BENCHMARK_UPC, sn) for sn in range(1, legacy_count + 1)], total_qty=total_qty))
+        results.append(measure('encode_batch', total_qty, lambda: generate_epc_batch(BENCHMARK_UPC, 1, total_qty), total_qty=total_qty))
+        if importlib.util.find_spec('pandas') is None:
+            results.append({'stage': 'dataframe_build', 'total_qty': total_qty, 'skipped': 'pandas is not installed'})
+        else:
+            results.append(measure('dataframe_build', total_qty, lambda: build_dataframe(total_qty), total_qty=total_qty))
+        # One file holding the whole quantity, as a single DB or the single range mode would write it
+        xlsx_count = min(total_qty, 1048575)
+        results.append(measure('xlsx_write', xlsx_count, lambda: write_db_xlsx(os.path.join(work_dir, 'bench.xlsx'), BENCHMARK_UPC, 1, xlsx_count),
+                               total_qty=total_qty))
+        results.append(measure('csv_write', total_qty, lambda: write_db_delimited(os.path.join(work_dir, 'bench.csv'), BENCHMARK_UPC, 1, total_qty),
+                               total_qty=total_qty))
+        results.append(measure('roll_plan', total_qty, lambda: write_roll_plan(os.path.join(work_dir, 'bench.RollPlan.csv'), BENCHMARK_UPC,
+                                                                               1, total_qty, 1000, qty_dbs[0]), total_qty=total_qty, lpr=1000))
+        # The Preview window only encodes the rows on screen, wherever in the job they are
+        results.append(measure('preview', 10, lambda: preview_rows(BENCHMARK_UPC, 1, total_qty, 1000, qty_dbs[0], total_qty // 2, 10),
+                               total_qty=total_qty))
+        for qty_db in qty_dbs:
+            if qty_db > total_qty:
+                continue
+            for parallel_run in ([False, True] if parallel else [False]):
+                job_dir = os.path.join(work_dir, f"job-{total_qty}-{qty_db}-{int(parallel_run)}")
+                os.makedirs(job_dir)
+                # The job manifest is rewritten from scratch on every run, so running it twice writes every DB twice
+                results.append(measure('generate_database', total_qty,
+                                       lambda: generate_database(BENCHMARK_UPC, 1, total_qty, qty_db, job_dir, parallel=parallel_run),
+                                       total_qty=total_qty, qty_db=qty_db, parallel=parallel_run))
+                if parallel_run or not parallel:
+                    results.append(measure('verify_job', total_qty, lambda: verify_job(job_dir, parallel=parallel_run),
+                                           total_qty=total_qty, qty_db=qty_db, parallel=parallel_run))
+                shutil.rmtree(job_dir)
+        if os.path.exists(ROLL_TRACKER_TEMPLATE):
+            results.append(measure('roll_tracker', total_qty, lambda: fill_roll_tracker(ROLL_TRACKER_TEMPLATE, BENCHMARK_UPC, 1, total_qty, 1000,
+                                                                                        total_qty, qty_dbs[0], work_dir), total_qty=total_qty))
+        else:
+            results.append({'stage': 'roll_tracker', 'total_qty': total_qty, 'skipped': f"{ROLL_TRACKER_TEMPLATE} not found"})
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def result_key(record):
+    return (record['stage'], record.get('total_qty'), record.get('qty_db'), record.get('parallel'))
+
+def compare_results(baseline_path, results):
+    """ Print each stage's labels/sec against an earlier run's JSON file """
+    with open(baseline_path) as f:
+        baseline = {result_key(record): record for record in json.load(f)['results']}
+    for record in results:
+        before = baseline.get(result_key(record))
+        if not before or not before.get('labels_per_sec') or not record.get('labels_per_sec'):
+            continue
+        ratio = record['labels_per_sec'] / before['labels_per_sec']
+        print(f"{record['stage']:<22} {record.get('total_qty') or 0:>10,} {record.get('qty_db') or '':>8} {before['labels_per_sec']:>12,} -> "
+              f"{record['labels_per_sec']:>12,} labels/sec ({ratio:.2f}x)")
+
+def parse_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of DB generation and write the results as JSON")
+    parser.add_argument('--quantities', type=parse_list, default=DEFAULT_QUANTITIES, help="Comma separated total quantities")
+    parser.add_argument('--qty-db', type=parse_list, default=DEFAULT_QTY_DBS, help="Comma separated Qty/DB sizes")
+    parser.add_argument('--quick', action='store_true', help="Only 10k and 100k labels")
+    parser.add_argument('--no-parallel', action='store_true', help="Skip the parallel generate_database runs")
+    parser.add_argument('--no-memory', action='store_true', help="Only time each stage, skipping the traced run for peak memory")
+    parser.add_argument('--output', default=None, help="JSON results file (default: benchmark-<time>.json)")
+    parser.add_argument('--compare', default=None, help="An earlier results file to compare against")
+    args = parser.parse_args(argv)
+    global measure_memory
+    measure_memory = not args.no_memory
+
+    quantities = [q for q in args.quantities if q <= 100000] if args.quick else args.quantities
+    started_at = datetime.datetime.now()
+    work_dir = tempfile.mkdtemp(prefix='upc2epc-benchmark-')
+    try:
+        results = run_benchmarks(quantities, args.qty_db, work_dir, parallel=not args.no_parallel)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = args.output or f"benchmark-{started_at.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare_results(args.compare, results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SPEC_PATH = os.path.join(HERE, 'UPC2EPC.spec')
+EXE_PATH = os.path.join(HERE, 'dist', 'UPC2EPC.exe' if sys.platform == 'win32' else 'UPC2EPC')
+STARTUP_REPORT_PATH = os.path.join(HERE, 'dist', 'UPC2EPC.startup.json')
+
+def build_exe():
+    subprocess.run([sys.executable, '-m', 'PyInstaller', '--noconfirm', SPEC_PATH], cwd=HERE, check=True)
+
+def measure_startup(command, runs=3, timeout=120):
+    """ Seconds from launching command to the app's first paint, once per run
+
+    The app is started with --startup-report, writes the time of its first paint and exits. The first run of a
+    fresh onefile build also includes unpacking the bundle, so it is reported on its own as the cold start. """
+    timings = []
+    for _ in range(runs):
+        handle, report_path = tempfile.mkstemp(suffix='.json', prefix='upc2epc-startup-')
+        os.close(handle)
+        try:
+            launched = time.time()
+            subprocess.run(command + ['--startup-report', report_path], cwd=HERE, timeout=timeout, check=True)
+            with open(report_path) as f:
+                timings.append(json.load(f)['first_paint'] - launched)
+        finally:
+            os.remove(report_path)
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build UPC2EPC with PyInstaller and report how long it takes to show its window")
+    parser.add_argument('--skip-build', action='store_true', help="Only measure the existing build")
+    parser.add_argument('--source', action='store_true', help="Measure python UPC2EPC.py instead of the built exe")
+    parser.add_argument('--runs', type=int, default=3, help="Launches to time (default: 3)")
+    args = parser.parse_args(argv)
+
+    if args.source:
+        command = [sys.executable, os.path.join(HERE, 'UPC2EPC.py')]
+    else:
+        if not args.skip_build:
+            build_exe()
+        command = [EXE_PATH]
+    timings = measure_startup(command, args.runs)
+    report = {
+        'measured_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'command': command,
+        'bundle_bytes': None if args.source else os.path.getsize(EXE_PATH),
+        'cold_seconds': round(timings[0], 3),
+        'warm_seconds': round(statistics.median(timings[1:]), 3) if len(timings) > 1 else None,
+        'runs': [round(seconds, 3) for seconds in timings],
+    }
+    if report['bundle_bytes']:
+        print(f"{EXE_PATH}: {report['bundle_bytes'] / 1048576:.1f} MB")
+    print(f"Startup to first paint: {report['cold_seconds']:.2f}s cold"
+          + (f", {report['warm_seconds']:.2f}s warm (median of {len(timings) - 1})" if report['warm_seconds'] is not None else ""))
+    if not args.source:
+        with open(STARTUP_REPORT_PATH, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"Report written to {STARTUP_REPORT_PATH}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import datetime
+import os
+
+from json_file import load_json, save_json
+
+# Local copy of the customer / label size / template tree so the Job Creator never waits on the share at startup
+INDEX_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.upc2epc', 'directory_index.json')
+
+def scan_dir(path):
+    """ (mtime_ns of path, sorted names of its subfolders, sorted names of its files) using a single scandir pass """
+    folders = []
+    files = []
+    mtime_ns = os.stat(path).st_mtime_ns
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    folders.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    return mtime_ns, sorted(folders, key=str.lower), sorted(files, key=str.lower)
+
+def index_tree(root_path, previous, list_templates):
+    """ Index root_path/<customer>/<label size>, reusing any folder from `previous` whose mtime has not changed
+
+    Adding or removing an entry changes its parent folder's mtime, so an unchanged folder's cached listing is still
+    valid and only costs a stat instead of a listing. """
+    root_mtime, customer_names, unused = scan_dir(root_path)
+    previous_customers = (previous or {}).get('customers', {})
+    tree = {'mtime_ns': root_mtime, 'customers': {}}
+    for customer in customer_names:
+        customer_path = os.path.join(root_path, customer)
+        cached = previous_customers.get(customer)
+        try:
+            if cached and os.stat(customer_path).st_mtime_ns == cached['mtime_ns']:
+                customer_mtime, sizes = cached['mtime_ns'], cached['label_sizes']
+            else:
+                customer_mtime, sizes, unused = scan_dir(customer_path)
+        except OSError:
+            continue
+        entry = {'mtime_ns': customer_mtime, 'label_sizes': sizes}
+        if list_templates:
+            cached_files = (cached or {}).get('files', {})
+            entry['files'] = {}
+            for label_size in sizes:
+                label_size_path = os.path.join(customer_path, label_size)
+                cached_label_size = cached_files.get(label_size)
+                try:
+                    if cached_label_size and os.stat(label_size_path).st_mtime_ns == cached_label_size['mtime_ns']:
+                        entry['files'][label_size] = cached_label_size
+                        continue
+                    label_size_mtime, unused, files = scan_dir(label_size_path)
+                except OSError:
+                    continue
+                entry['files'][label_size] = {'mtime_ns': label_size_mtime, 'templates': [f for f in files if f.lower().endswith('.btw')]}
+        tree['customers'][customer] = entry
+    return tree
+
+def build_index(base_path, template_base_path, previous=None):
+    """ Customers and label sizes under base_path plus the Template *.btw files under template_base_path """
+    previous = previous or {}
+    index = {'base_path': base_path, 'template_base_path': template_base_path}
+    index['jobs'] = index_tree(base_path, previous.get('jobs') if previous.get('base_path') == base_path else None, False)
+    try:
+        index['templates'] = index_tree(template_base_path, previous.get('templates') if previous.get('template_base_path') == template_base_path else None, True)
+    except OSError:
+        index['templates'] = previous.get('templates', {'customers': {}})
+    index['built_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+    return index
+
+def load_index(cache_path=INDEX_CACHE_PATH):
+    return load_json(cache_path)
+
+def save_index(index, cache_path=INDEX_CACHE_PATH):
+    save_json(cache_path, index)
+
+def refresh_index(base_path, template_base_path, cache_path=INDEX_CACHE_PATH):
+    """ Rebuild the index against the share, only re-listing folders that changed, and persist it
+
+    Raises OSError when base_path is unreachable, leaving the cached index as it was. """
+    index = build_index(base_path, template_base_path, load_index(cache_path))
+    save_index(index, cache_path)
+    return index
+
+def customers(index):
+    return list(index['jobs']['customers']) if index else []
+
+def label_sizes(index, customer):
+    entry = index['jobs']['customers'].get(customer) if index else None
+    return list(entry['label_sizes']) if entry else None
+
+def templates(index, customer, label_size):
+    entry = index['templates']['customers'].get(customer) if index else None
+    files = entry.get('files', {}).get(label_size) if entry else None
+    return list(files['templates']) if files else []
@@ -0,0 +1,179 @@
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from epc_engine import DB_FILE_RE, SERIAL_MASK, decode_epc, iter_db_rows
+from json_file import load_json, save_json
+
+# Per-file serial runs from the last audit, so a re-run only reads DB files that were added or changed since
+AUDIT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.upc2epc', 'epc_audit.json')
+
+def epc_key(epc):
+    """ (item key, serial) for one EPC: every bit but the serial, so equal keys with equal serials are the same EPC
+
+    SGTIN-96 takes the fast path; other schemes are decoded, and a non-numeric SGTIN-198 serial becomes part of the
+    key with serial 0. Returns None for anything that is not an EPC. """
+    if len(epc) == 24 and epc[:2] == '30':
+        try:
+            value = int(epc, 16)
+        except ValueError:
+            return None
+        return format(value >> 38, '015X'), value & SERIAL_MASK
+    try:
+        decoded = decode_epc(epc)
+    except ValueError:
+        return None
+    item = decoded.get('gtin14') or decoded['serial_reference'][0] + decoded['company_prefix']
+    key = f"{decoded['scheme']}:{item}:{decoded['partition']}:{decoded['filter']}"
+    if isinstance(decoded['serial'], int):
+        return key, decoded['serial']
+    return f"{key}:{decoded['serial']}", 0
+
+def describe_epc(key, serial):
+    return format(int(key, 16) << 38 | serial, '024X') if len(key) == 15 else f"{key} #{serial}"
+
+def scan_db_file(file_path):
+    """ Stream one DB file's EPC column into runs of consecutive serials per item key
+
+    Returns {'rows', 'runs': {key: [[first, last], ...]}, 'bad': count of cells that are not EPCs}. A DB file is
+    normally a single run, so the result stays tiny however many rows the file has. """
+    runs = {}
+    rows = 0
+    bad = 0
+    epc_column = 2
+    row_iter = iter_db_rows(file_path)
+    header = next(row_iter, None)
+    if header and 'EPC' in header:
+        epc_column = header.index('EPC')
+    last_key = None
+    current = None
+    for row in row_iter:
+        rows += 1
+        parsed = epc_key(str(row[epc_column]).strip()) if len(row) > epc_column and row[epc_column] is not None else None
+        if parsed is None:
+            bad += 1
+            continue
+        key, serial = parsed
+        if key == last_key and serial == current[1] + 1:
+            current[1] = serial
+            continue
+        current = [serial, serial]
+        runs.setdefault(key, []).append(current)
+        last_key = key
+    return {'rows': rows, 'runs': runs, 'bad': bad}
+
+def find_share_db_files(base_path):
+    """ Every DB file under base_path with its size and mtime, found with one scandir pass per folder
+
+    The text database of a DB that also has its xlsx holds the same EPCs, so only the xlsx is audited. """
+    found = {}
+    pending = [base_path]
+    while pending:
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                db_entries = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            pending.append(entry.path)
+                        elif DB_FILE_RE.match(entry.name):
+                            db_entries.append(entry)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        names = {entry.name.lower() for entry in db_entries}
+        for entry in db_entries:
+            if entry.name.lower().endswith('.txt') and entry.name[:-4].lower() + '.xlsx' in names:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+def load_audit_cache(cache_path=AUDIT_CACHE_PATH):
+    return load_json(cache_path)
+
+def save_audit_cache(cache, cache_path=AUDIT_CACHE_PATH):
+    save_json(cache_path, cache)
+
+def find_collisions(files):
+    """ Sweep each item key's runs in serial order and return every serial range found in more than one place
+
+    files is {path: scan_db_file result}. Two runs overlapping inside the same file are reported too. """
+    by_key = {}
+    for file_path, scanned in files.items():
+        for key, runs in scanned['runs'].items():
+            by_key.setdefault(key, []).extend((first, last, file_path) for first, last in runs)
+    collisions = []
+    for key, runs in by_key.items():
+        if len(runs) < 2:
+            continue
+        runs.sort()
+        active = []
+        for first, last, file_path in runs:
+            active = [run for run in active if run[1] >= first]
+            for other_first, other_last, other_path in active:
+                overlap_last = min(last, other_last)
+                collisions.append({
+                    'key': key,
+                    'first_serial': first,
+                    'last_serial': overlap_last,
+                    'count': overlap_last - first + 1,
+                    'first_epc': describe_epc(key, first),
+                    'files': [other_path, file_path],
+                })
+            active.append((first, last, file_path))
+    collisions.sort(key=lambda c: (c['key'], c['first_serial']))
+    return collisions
+
+def audit_share(base_path, full=False, workers=None, cache_path=AUDIT_CACHE_PATH, progress=None):
+    """ Find every EPC that appears in more than one DB file (or twice in one) anywhere under base_path
+
+    Files whose size and mtime match the last audit are not read again unless full is set; the rest are read in
+    parallel across worker processes. progress(files_done, files_to_read) is called as files finish.
+    Returns a report dict with the collisions and scan counts. """
+    cache = None if full else load_audit_cache(cache_path)
+    if not cache or cache.get('base_path') != base_path:
+        cache = {'base_path': base_path, 'files': {}}
+    found = find_share_db_files(base_path)
+    files = {}
+    todo = []
+    for file_path, (size, mtime_ns) in found.items():
+        cached = cache['files'].get(file_path)
+        if cached and cached['size'] == size and cached['mtime_ns'] == mtime_ns:
+            files[file_path] = cached
+        else:
+            todo.append(file_path)
+
+    errors = []
+    # Largest first so one big file does not hold up the end of the scan
+    todo.sort(key=lambda path: -found[path][0])
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures = [(file_path, executor.submit(scan_db_file, file_path)) for file_path in todo]
+        for done, (file_path, future) in enumerate(futures, 1):
+            try:
+                scanned = future.result()
+            except Exception as e:
+                errors.append(f"{file_path}: {str(e)}")
+            else:
+                size, mtime_ns = found[file_path]
+                scanned.update(size=size, mtime_ns=mtime_ns)
+                files[file_path] = scanned
+            if progress:
+                progress(done, len(todo))
+
+    cache['files'] = files
+    cache['scanned_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+    save_audit_cache(cache, cache_path)
+    return {
+        'files': len(files),
+        'read': len(todo) - len(errors),
+        'rows': sum(scanned['rows'] for scanned in files.values()),
+        'bad': sum(scanned['bad'] for scanned in files.values()),
+        'errors': errors,
+        'collisions': find_collisions(files),
+    }
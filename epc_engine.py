@@ -0,0 +1,1034 @@
+import codecs
+import csv
+import functools
+import glob
+import hashlib
+import itertools
+import math
+import os
+import re
+import shutil
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from xml.sax.saxutils import escape, unescape
+
+from json_file import load_json, save_json
+from share_upload import ShareUploader
+
+
+class GenerationCancelled(Exception):
+    """ Raised by generate_database when its cancel_event is set; files already written are removed first """
+    def __init__(self, removed):
+        super().__init__(f"Generation cancelled, {removed} partial DB file(s) removed.")
+        self.removed = removed
+
+def apply_overage(total_qty, two_percent=False, seven_percent=False):
+    """ Same 2% / 7% overage math as the Database Generator's checkboxes """
+    total_qty = int(total_qty)
+    if two_percent:
+        total_qty += total_qty * 0.02
+    if seven_percent:
+        total_qty += total_qty * 0.07
+    return int(total_qty)
+
+def dec_to_bin(value, length):
+    return bin(int(value))[2:].zfill(length)
+
+def bin_to_hex(binary_str):
+    hex_str = hex(int(binary_str, 2))[2:].upper()
+    return hex_str.zfill(len(binary_str) // 4)
+
+def generate_epc(upc, serial_number):
+    gs1_company_prefix = "0" + upc[:6]
+    item_reference_number = upc[6:11]
+    gtin14 = "0" + gs1_company_prefix + item_reference_number
+    header = "00110000"
+    filter_value = "001"
+    partition = "101"
+    gs1_binary = dec_to_bin(gs1_company_prefix, 24)
+    item_reference_binary = dec_to_bin(item_reference_number, 20)
+    serial_binary = dec_to_bin(serial_number, 38)
+    epc_binary = header + filter_value + partition + gs1_binary + item_reference_binary + serial_binary
+    epc_hex = bin_to_hex(epc_binary)
+    return epc_hex
+
+# EPC scheme -> (header, EPC bits)
+EPC_SCHEMES = {
+    'sgtin-96': (0x30, 96),
+    'sgtin-198': (0x36, 198),
+    'sscc-96': (0x31, 96),
+}
+# (scheme, partition, filter) every job used before schemes were selectable: 7-digit company prefix, filter 1 (POS item)
+DEFAULT_ENCODING = ('sgtin-96', 5, 1)
+
+# SGTIN partition value -> (company prefix bits, company prefix digits, item reference bits, item reference digits)
+SGTIN_PARTITIONS = {
+    0: (40, 12, 4, 1),
+    1: (37, 11, 7, 2),
+    2: (34, 10, 10, 3),
+    3: (30, 9, 14, 4),
+    4: (27, 8, 17, 5),
+    5: (24, 7, 20, 6),
+    6: (20, 6, 24, 7),
+}
+# SSCC partition value -> (company prefix bits, company prefix digits, serial reference bits, serial reference digits)
+SSCC_PARTITIONS = {
+    0: (40, 12, 18, 5),
+    1: (37, 11, 21, 6),
+    2: (34, 10, 24, 7),
+    3: (30, 9, 28, 8),
+    4: (27, 8, 31, 9),
+    5: (24, 7, 34, 10),
+    6: (20, 6, 38, 11),
+}
+SERIAL_MASK = (1 << 38) - 1
+# SGTIN-198 serials are up to 20 characters of the GS1 AI 82 set, 7 bits each
+SGTIN198_SERIAL_CHARS = 20
+SGTIN198_CHARSET = frozenset('!"%&\'()*+,-./0123456789:;<=>?ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz')
+
+def gtin_check_digit(digits):
+    """ GS1 mod-10 check digit for a GTIN without its check digit """
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits)))
+    return str((10 - total % 10) % 10)
+
+def normalize_gtin(code):
+    """ A 12-digit UPC-A, 13-digit EAN-13 or 14-digit GTIN-14 as a GTIN-14 """
+    code = str(code).strip()
+    if not code.isdigit() or len(code) not in (12, 13, 14):
+        raise ValueError(f"Expected a 12-digit UPC, 13-digit EAN or 14-digit GTIN: {code!r}")
+    return code.zfill(14)
+
+@functools.lru_cache(maxsize=1024)
+def epc_template(code, scheme='sgtin-96', partition=5, filter_value=1):
+    """ Everything but the serial of an item's EPCs, worked out once per (code, scheme, partition, filter) and cached
+
+    For SGTIN the code is a UPC-A, EAN-13 or GTIN-14 and the partition sets the company prefix length; for SSCC-96 it
+    is the extension digit followed by the company prefix, and the serial is the serial reference. An EPC is then
+    head + format(tail + (serial << serial_shift), tail_format), so encoding a tag only merges its serial in.
+    Returns (head, tail, tail_format, serial_shift, max_serial, alphanumeric). """
+    if scheme not in EPC_SCHEMES:
+        raise ValueError(f"Unknown EPC scheme {scheme!r}, expected one of: {', '.join(EPC_SCHEMES)}")
+    if not 0 <= filter_value <= 7:
+        raise ValueError(f"Filter value must be 0-7: {filter_value}")
+    header, bits = EPC_SCHEMES[scheme]
+    code = str(code).strip()
+    serial_offset = 0
+    if scheme == 'sscc-96':
+        if partition not in SSCC_PARTITIONS:
+            raise ValueError(f"Invalid SSCC partition {partition}, expected 0-6")
+        cp_bits, cp_digits, serial_bits, sr_digits = SSCC_PARTITIONS[partition]
+        if not code.isdigit() or len(code) != cp_digits + 1:
+            raise ValueError(f"SSCC-96 partition {partition} needs the extension digit and a {cp_digits}-digit company prefix: {code!r}")
+        fields = int(code[1:])
+        # The extension digit is the top digit of the serial reference
+        serial_offset = int(code[0]) * 10 ** (sr_digits - 1)
+        max_serial = 10 ** (sr_digits - 1) - 1
+    else:
+        if partition not in SGTIN_PARTITIONS:
+            raise ValueError(f"Invalid SGTIN partition {partition}, expected 0-6")
+        cp_bits, cp_digits, ir_bits, ir_digits = SGTIN_PARTITIONS[partition]
+        gtin14 = normalize_gtin(code)
+        # The indicator digit leads the item reference; the check digit is not encoded
+        fields = int(gtin14[1:cp_digits + 1]) << ir_bits | int(gtin14[0] + gtin14[cp_digits + 1:13])
+        cp_bits += ir_bits
+        serial_bits = bits - 14 - cp_bits
+        max_serial = SERIAL_MASK if scheme == 'sgtin-96' else 10 ** SGTIN198_SERIAL_CHARS - 1
+    # EPCs are written to tags in 16-bit words, so SGTIN-198 is zero padded to 208 bits
+    padding = -bits % 16
+    serial_shift = bits - 14 - cp_bits - serial_bits + padding
+    value = ((header << 6 | filter_value << 3 | partition) << cp_bits | fields) << (serial_bits + serial_shift)
+    value |= serial_offset << serial_shift
+    # Only the low hex digits that the serial can touch are formatted per tag
+    tail_digits = -(-(serial_bits + serial_shift) // 4)
+    head = format(value >> tail_digits * 4, f'0{(bits + padding) // 4 - tail_digits}X')
+    tail = value & ((1 << tail_digits * 4) - 1)
+    return head, tail, f'0{tail_digits}X', serial_shift, max_serial, scheme == 'sgtin-198'
+
+def make_encoding(scheme=None, partition=None, filter_value=None):
+    """ (scheme, partition, filter) with anything left blank taken from the default encoding """
+    default_scheme, default_partition, default_filter = DEFAULT_ENCODING
+    scheme = str(scheme or default_scheme).strip().lower()
+    if scheme not in EPC_SCHEMES:
+        raise ValueError(f"Unknown EPC scheme {scheme!r}, expected one of: {', '.join(EPC_SCHEMES)}")
+    try:
+        partition = default_partition if partition in (None, '') else int(partition)
+        filter_value = default_filter if filter_value in (None, '') else int(filter_value)
+    except ValueError:
+        raise ValueError("Partition and filter must be integers.")
+    return scheme, partition, filter_value
+
+def is_valid_code(code, encoding=DEFAULT_ENCODING):
+    try:
+        epc_template(code, *encoding)
+    except ValueError:
+        return False
+    return True
+
+def sgtin198_serial_bits(serial):
+    serial = str(serial)
+    if not serial or len(serial) > SGTIN198_SERIAL_CHARS or not SGTIN198_CHARSET.issuperset(serial):
+        raise ValueError(f"SGTIN-198 serials are 1-{SGTIN198_SERIAL_CHARS} GS1 AI 82 characters: {serial!r}")
+    value = 0
+    for char in serial:
+        value = value << 7 | ord(char)
+    return value << 7 * (SGTIN198_SERIAL_CHARS - len(serial))
+
+def encode_epc(template, serial):
+    """ One EPC from an epc_template; SGTIN-198 also takes alphanumeric serials """
+    head, tail, tail_format, serial_shift, max_serial, alphanumeric = template
+    if alphanumeric:
+        return head + format(tail + (sgtin198_serial_bits(serial) << serial_shift), tail_format)
+    if not 0 <= serial <= max_serial:
+        raise ValueError(f"Serial numbers must be between 0 and {max_serial}.")
+    return head + format(tail + (serial << serial_shift), tail_format)
+
+def encode_epc_batch(template, start_serial, count):
+    """ Encode `count` consecutive numeric serials starting at `start_serial` from an epc_template """
+    head, tail, tail_format, serial_shift, max_serial, alphanumeric = template
+    if start_serial < 0 or start_serial + count - 1 > max_serial:
+        raise ValueError(f"Serial numbers must be between 0 and {max_serial}.")
+    serials = range(start_serial, start_serial + count)
+    if alphanumeric:
+        return [head + format(tail + (sgtin198_serial_bits(sn) << serial_shift), tail_format) for sn in serials]
+    if serial_shift:
+        return [head + format(tail + (sn << serial_shift), tail_format) for sn in serials]
+    return [head + format(tail + sn, tail_format) for sn in serials]
+
+def generate_epc_batch(upc, start_serial, count, encoding=DEFAULT_ENCODING):
+    """ Encode `count` consecutive serials starting at `start_serial`; the default encoding matches generate_epc """
+    return encode_epc_batch(epc_template(upc, *encoding), start_serial, count)
+
+def decode_epc(epc_hex):
+    """ Decode an SGTIN-96, SGTIN-198 or SSCC-96 EPC hex string back into its fields """
+    epc_hex = epc_hex.strip()
+    try:
+        value = int(epc_hex, 16)
+    except ValueError:
+        raise ValueError(f"EPCs are hex digits: {epc_hex!r}")
+    header = int(epc_hex[:2], 16)
+    schemes = {scheme_header: scheme for scheme, (scheme_header, bits) in EPC_SCHEMES.items()}
+    if header not in schemes:
+        raise ValueError(f"Not an SGTIN-96, SGTIN-198 or SSCC-96 EPC (header {header:#04x}): {epc_hex}")
+    scheme = schemes[header]
+    bits = EPC_SCHEMES[scheme][1]
+    padding = -bits % 16
+    if len(epc_hex) != (bits + padding) // 4:
+        raise ValueError(f"{scheme.upper()} EPCs are {(bits + padding) // 4} hex digits: {epc_hex!r}")
+    value >>= padding
+    filter_value = (value >> (bits - 11)) & 0b111
+    partition = (value >> (bits - 14)) & 0b111
+    partitions = SSCC_PARTITIONS if scheme == 'sscc-96' else SGTIN_PARTITIONS
+    if partition not in partitions:
+        raise ValueError(f"Invalid {scheme.upper()} partition {partition}: {epc_hex}")
+    cp_bits, cp_digits, ref_bits, ref_digits = partitions[partition]
+    serial_bits = bits - 14 - cp_bits - ref_bits
+    company_prefix = str((value >> (bits - 14 - cp_bits)) & ((1 << cp_bits) - 1)).zfill(cp_digits)
+    reference = str((value >> serial_bits) & ((1 << ref_bits) - 1)).zfill(ref_digits)
+    if len(company_prefix) != cp_digits or len(reference) != ref_digits:
+        raise ValueError(f"Company prefix or reference out of range: {epc_hex}")
+    decoded = {
+        'scheme': scheme,
+        'header': header,
+        'filter': filter_value,
+        'partition': partition,
+        'company_prefix': company_prefix,
+    }
+    if scheme == 'sscc-96':
+        # The first serial reference digit is the SSCC extension digit
+        sscc17 = reference[0] + company_prefix + reference[1:]
+        decoded['serial_reference'] = reference
+        decoded['sscc'] = sscc17 + gtin_check_digit(sscc17)
+        decoded['serial'] = int(reference[1:])
+        return decoded
+    # The first item reference digit is the GTIN-14 indicator digit
+    gtin13 = reference[0] + company_prefix + reference[1:]
+    decoded['item_reference'] = reference
+    decoded['gtin14'] = gtin13 + gtin_check_digit(gtin13)
+    serial_value = value & ((1 << serial_bits) - 1)
+    if scheme == 'sgtin-96':
+        decoded['serial'] = serial_value
+    else:
+        chars = [(serial_value >> 7 * (SGTIN198_SERIAL_CHARS - 1 - i)) & 0x7F for i in range(SGTIN198_SERIAL_CHARS)]
+        decoded['serial'] = ''.join(chr(c) for c in chars).split('\0', 1)[0]
+    return decoded
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Style 1 is the bold, bordered, centered header that pandas used to write
+XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="top"/></xf></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+XLSX_ROW_BLOCK = 10000
+# Rows in an Excel sheet, header included
+EXCEL_MAX_ROWS = 1048576
+# Output formats of the single range mode -> field delimiter (None for xlsx)
+RANGE_FORMATS = {'xlsx': None, 'csv': ',', 'tsv': '\t'}
+
+def write_db_xlsx(file_path, upc, chunk_start, chunk_end, encoding=DEFAULT_ENCODING):
+    """ Stream one UPC / Serial # / EPC database straight to an xlsx file without holding the rows in memory
+
+    Returns the seconds spent encoding EPCs; the rest of the time went to building and compressing the sheet. """
+    num_rows = chunk_end - chunk_start + 1
+    template = epc_template(upc, *encoding)
+    encode_seconds = 0
+    upc_cell = f'<is><t>{upc}</t></is>'
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', XLSX_WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', XLSX_STYLES)
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<dimension ref="A1:C{num_rows + 1}"/>'
+                '<cols><col min="3" max="3" width="40" customWidth="1"/></cols>'
+                '<sheetData>'
+                '<row r="1"><c r="A1" s="1" t="inlineStr"><is><t>UPC</t></is></c>'
+                '<c r="B1" s="1" t="inlineStr"><is><t>Serial #</t></is></c>'
+                '<c r="C1" s="1" t="inlineStr"><is><t>EPC</t></is></c></row>'
+            ).encode())
+            for block_start in range(chunk_start, chunk_end + 1, XLSX_ROW_BLOCK):
+                block_count = min(XLSX_ROW_BLOCK, chunk_end - block_start + 1)
+                encode_started = time.perf_counter()
+                epc_values = encode_epc_batch(template, block_start, block_count)
+                encode_seconds += time.perf_counter() - encode_started
+                first_row = block_start - chunk_start + 2
+                sheet.write(''.join(
+                    f'<row r="{r}"><c r="A{r}" t="inlineStr">{upc_cell}</c><c r="B{r}"><v>{sn}</v></c>'
+                    f'<c r="C{r}" t="inlineStr"><is><t>{epc}</t></is></c></row>'
+                    for r, sn, epc in zip(range(first_row, first_row + block_count), range(block_start, block_start + block_count), epc_values)
+                ).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    return encode_seconds
+
+def write_db_delimited(file_path, upc, chunk_start, chunk_end, delimiter=',', encoding=DEFAULT_ENCODING):
+    """ Same UPC / Serial # / EPC rows as write_db_xlsx as delimited text, streamed in blocks at disk speed
+
+    Rows are plain ASCII with no quoting, one CRLF line each. Returns the seconds spent encoding EPCs. """
+    template = epc_template(upc, *encoding)
+    encode_seconds = 0
+    with open(file_path, 'w', encoding='ascii', newline='', buffering=1 << 20) as f:
+        f.write(f'UPC{delimiter}Serial #{delimiter}EPC\r\n')
+        prefix = f'{upc}{delimiter}'
+        for block_start in range(chunk_start, chunk_end + 1, XLSX_ROW_BLOCK):
+            block_count = min(XLSX_ROW_BLOCK, chunk_end - block_start + 1)
+            encode_started = time.perf_counter()
+            epc_values = encode_epc_batch(template, block_start, block_count)
+            encode_seconds += time.perf_counter() - encode_started
+            f.write(''.join(f'{prefix}{sn}{delimiter}{epc}\r\n' for sn, epc in zip(range(block_start, block_start + block_count), epc_values)))
+    return encode_seconds
+
+def range_parts(start_serial, end_serial, output_format='xlsx', max_rows=None):
+    """ Split a serial range into (first, last) parts that each fit one file: max_rows labels at most, and never past
+    Excel's row limit for xlsx """
+    limit = max_rows or end_serial - start_serial + 1
+    if RANGE_FORMATS[output_format] is None:
+        limit = min(limit, EXCEL_MAX_ROWS - 1)
+    return [(first, min(first + limit - 1, end_serial)) for first in range(start_serial, end_serial + 1, limit)]
+
+def write_range(upc, start_serial, end_serial, save_location, output_format='xlsx', max_rows=None, encoding=DEFAULT_ENCODING,
+                progress=None):
+    """ Single range mode: every serial from start_serial to end_serial in one file, or as few as the row limit allows
+
+    Files are streamed a block of rows at a time, so memory does not grow with the range. Returns the paths written;
+    progress(files_done, files_total) is called after each file. """
+    if output_format not in RANGE_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of: {', '.join(RANGE_FORMATS)}")
+    if start_serial > end_serial:
+        raise ValueError("Starting serial number must be less than or equal to the ending serial number.")
+    if max_rows is not None and max_rows <= 0:
+        raise ValueError("Max rows per file must be greater than zero.")
+    # Fail before any file is written if the range does not fit the scheme
+    template = epc_template(upc, *encoding)
+    encode_epc_batch(template, start_serial, 1)
+    encode_epc_batch(template, end_serial, 1)
+    parts = range_parts(start_serial, end_serial, output_format, max_rows)
+    num_serials = end_serial - start_serial + 1
+    written = []
+    for part_number, (first, last) in enumerate(parts, 1):
+        suffix = f"_{part_number}of{len(parts)}" if len(parts) > 1 else ""
+        file_path = os.path.join(save_location, f"{upc}_{num_serials}{suffix}.{output_format}")
+        if RANGE_FORMATS[output_format] is None:
+            write_db_xlsx(file_path, upc, first, last, encoding)
+        else:
+            write_db_delimited(file_path, upc, first, last, RANGE_FORMATS[output_format], encoding)
+        written.append(file_path)
+        if progress:
+            progress(part_number, len(parts))
+    return written
+
+def write_xlsx_rows(file_path, header, rows, widths=None):
+    """ Stream any header + rows (tuples of str / int / None) to a single-sheet xlsx in constant memory """
+    columns = [chr(65 + i) for i in range(len(header))]
+    cols = ''.join(f'<col min="{i + 1}" max="{i + 1}" width="{width}" customWidth="1"/>' for i, width in enumerate(widths or []) if width)
+
+    def cell(column, r, value):
+        if value is None:
+            return ''
+        if isinstance(value, (int, float)):
+            return f'<c r="{column}{r}"><v>{value}</v></c>'
+        return f'<c r="{column}{r}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', XLSX_WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', XLSX_STYLES)
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                + (f'<cols>{cols}</cols>' if cols else '') +
+                '<sheetData><row r="1">'
+                + ''.join(f'<c r="{column}1" s="1" t="inlineStr"><is><t>{escape(title)}</t></is></c>' for column, title in zip(columns, header)) +
+                '</row>'
+            ).encode())
+            block = []
+            for r, row in enumerate(rows, 2):
+                block.append(f'<row r="{r}">' + ''.join(cell(column, r, value) for column, value in zip(columns, row)) + '</row>')
+                if len(block) == XLSX_ROW_BLOCK:
+                    sheet.write(''.join(block).encode())
+                    block = []
+            sheet.write((''.join(block) + '</sheetData></worksheet>').encode())
+
+# DB file formats: the xlsx sheet, a BarTender text database (write_db_delimited with commas), or both side by side
+DB_FORMATS = ('xlsx', 'text', 'both')
+
+def db_file_name(upc, db_index, chunk_start, chunk_end, extension='xlsx'):
+    start_range = (chunk_start // 1000) + 1 if chunk_start % 1000 == 0 else (chunk_start // 1000)
+    end_range = ((chunk_end + 1) // 1000)
+    return f"{upc}.DB{db_index + 1}.{start_range}K-{end_range}K.{extension}"
+
+def db_chunks(start_serial, end_serial, qty_db):
+    num_dbs = math.ceil((end_serial - start_serial + 1) / qty_db)
+    for db_index in range(num_dbs):
+        chunk_start = start_serial + db_index * qty_db
+        chunk_end = min(chunk_start + qty_db - 1, end_serial)
+        yield db_index, chunk_start, chunk_end
+
+def file_checksum(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_stats(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_checksum(file_path)}
+
+def db_record_files(record):
+    """ Names of every file a job manifest record covers: the DB file, and its text database when both were written """
+    return [record['file']] + ([record['text']['file']] if 'text' in record else [])
+
+def write_db_chunk(save_location, upc, db_index, chunk_start, chunk_end, encoding=DEFAULT_ENCODING, db_format='xlsx'):
+    """ Write one DB file and return its job manifest record; runs in a worker process when generating in parallel
+
+    The record's file is the xlsx, or the text database when that is all that was written; with db_format 'both' the
+    text database gets its own size and checksum under 'text'. """
+    xlsx_name = db_file_name(upc, db_index, chunk_start, chunk_end)
+    text_name = db_file_name(upc, db_index, chunk_start, chunk_end, 'txt')
+    started = time.perf_counter()
+    encode_seconds = 0
+    if db_format != 'text':
+        encode_seconds += write_db_xlsx(os.path.join(save_location, xlsx_name), upc, chunk_start, chunk_end, encoding)
+    if db_format != 'xlsx':
+        encode_seconds += write_db_delimited(os.path.join(save_location, text_name), upc, chunk_start, chunk_end, ',', encoding)
+    written = time.perf_counter()
+    file_name = text_name if db_format == 'text' else xlsx_name
+    record = dict(
+        file_stats(os.path.join(save_location, file_name)),
+        file=file_name,
+        db=db_index + 1,
+        start_serial=chunk_start,
+        end_serial=chunk_end,
+        rows=chunk_end - chunk_start + 1,
+    )
+    if db_format == 'both':
+        record['text'] = dict(file_stats(os.path.join(save_location, text_name)), file=text_name)
+    record.update(
+        encode_seconds=round(encode_seconds, 4),
+        write_seconds=round(written - started - encode_seconds, 4),
+        checksum_seconds=round(time.perf_counter() - written, 4),
+    )
+    return record
+
+def job_manifest_path(save_location, upc, start_serial, end_serial):
+    return os.path.join(save_location, f"{upc}.{start_serial}-{end_serial}.job.json")
+
+def load_job_manifest(manifest_path):
+    return load_json(manifest_path)
+
+def save_job_manifest(manifest_path, manifest):
+    save_json(manifest_path, manifest, indent=1)
+
+def db_file_intact(file_path, record, full_check=False):
+    """ Cheap check first: size and modification time unchanged means the file was not touched since it was written.
+    Otherwise, or with full_check, the file must still match its checksum. """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return False
+    if stat.st_size != record.get('size'):
+        return False
+    if not full_check and stat.st_mtime_ns == record.get('mtime_ns'):
+        return True
+    if file_checksum(file_path) != record.get('sha256'):
+        return False
+    record['mtime_ns'] = stat.st_mtime_ns
+    return True
+
+def manifest_matches(manifest, qty_db, encoding, db_format='xlsx'):
+    """ An earlier run can only be resumed with the same DB size, encoding and DB format; older manifests used the defaults """
+    return (bool(manifest) and manifest.get('qty_db') == qty_db and tuple(manifest.get('encoding', DEFAULT_ENCODING)) == tuple(encoding)
+            and manifest.get('db_format', 'xlsx') == db_format)
+
+def db_record_intact(save_location, record, full_check=False):
+    return db_file_intact(os.path.join(save_location, record['file']), record, full_check) and (
+        'text' not in record or db_file_intact(os.path.join(save_location, record['text']['file']), record['text'], full_check))
+
+def resumable_progress(save_location, upc, start_serial, end_serial, qty_db, encoding=DEFAULT_ENCODING, db_format='xlsx'):
+    """ (DBs already completed, total DBs) when a matching job manifest exists, otherwise None """
+    manifest = load_job_manifest(job_manifest_path(save_location, upc, start_serial, end_serial))
+    if not manifest_matches(manifest, qty_db, encoding, db_format):
+        return None
+    return len(manifest.get('dbs', {})), math.ceil((end_serial - start_serial + 1) / qty_db)
+
+def generate_database(upc, start_serial, end_serial, qty_db, save_location, parallel=True, executor=None, progress=None,
+                      cancel_event=None, resume=False, full_check=False, staging_dir=None, uploader=None, encoding=DEFAULT_ENCODING,
+                      db_format='xlsx'):
+    """ Write every DB file for a serial range and return their paths, one per DB (its xlsx when both formats are written)
+
+    A job manifest next to the outputs records every completed DB with its serial range, row count and checksum.
+    With resume, DB files that still match the manifest are kept and only missing or corrupt ones are written.
+    With staging_dir, DB files are written to that local folder first and moved to save_location in the background
+    by a ShareUploader (pass one to share it across jobs).
+    encoding is (scheme, partition, filter) as taken by epc_template; db_format is one of DB_FORMATS.
+    progress(dbs_done, labels_done) is called after each DB file is in place. Pass an executor to share one process
+    pool across many jobs; otherwise a pool sized to the machine is created when parallel is set. """
+    if executor is None and parallel and qty_db < end_serial - start_serial + 1:
+        with ProcessPoolExecutor(max_workers=min(math.ceil((end_serial - start_serial + 1) / qty_db), os.cpu_count() or 1)) as own_executor:
+            return generate_database(upc, start_serial, end_serial, qty_db, save_location, executor=own_executor, progress=progress,
+                                     cancel_event=cancel_event, resume=resume, full_check=full_check, staging_dir=staging_dir,
+                                     uploader=uploader, encoding=encoding, db_format=db_format)
+    if staging_dir is not None and uploader is None:
+        with ShareUploader() as own_uploader:
+            return generate_database(upc, start_serial, end_serial, qty_db, save_location, executor=executor, progress=progress,
+                                     cancel_event=cancel_event, resume=resume, full_check=full_check, staging_dir=staging_dir,
+                                     uploader=own_uploader, encoding=encoding, db_format=db_format)
+
+    epc_template(upc, *encoding)
+    if db_format not in DB_FORMATS:
+        raise ValueError(f"Unknown DB format {db_format!r}, expected one of: {', '.join(DB_FORMATS)}")
+    chunks = list(db_chunks(start_serial, end_serial, qty_db))
+    manifest_path = job_manifest_path(save_location, upc, start_serial, end_serial)
+    manifest = load_job_manifest(manifest_path) if resume else None
+    if not manifest_matches(manifest, qty_db, encoding, db_format):
+        manifest = {'upc': upc, 'start_serial': start_serial, 'end_serial': end_serial, 'qty_db': qty_db, 'encoding': list(encoding),
+                    'db_format': db_format, 'dbs': {}}
+
+    all_files = []
+    todo = []
+    dbs_done = 0
+    labels_done = 0
+    for chunk in chunks:
+        file_name = db_file_name(upc, *chunk, db_extension(db_format))
+        all_files.append(os.path.join(save_location, file_name))
+        record = manifest['dbs'].get(file_name)
+        if record and db_record_intact(save_location, record, full_check):
+            dbs_done += 1
+            labels_done += record['rows']
+        else:
+            manifest['dbs'].pop(file_name, None)
+            todo.append(chunk)
+    save_job_manifest(manifest_path, manifest)
+    if progress and dbs_done:
+        progress(dbs_done, labels_done)
+
+    if staging_dir is not None:
+        # One folder per job so jobs running side by side never share staged files
+        write_location = os.path.join(staging_dir, f"{upc}.{start_serial}-{end_serial}")
+        os.makedirs(write_location, exist_ok=True)
+    else:
+        write_location = save_location
+    written = []
+    uploads = []
+    # (uploads, record) of staged DBs whose files are not all on the share yet
+    staged = []
+
+    def chunk_done(record):
+        """ Record a finished DB in the manifest; only ever called on this thread """
+        nonlocal dbs_done, labels_done
+        written.extend(os.path.join(save_location, file_name) for file_name in db_record_files(record))
+        if staging_dir is not None:
+            # The copies on the share are what a resume checks against
+            record['mtime_ns'] = os.stat(os.path.join(save_location, record['file'])).st_mtime_ns
+            if 'text' in record:
+                record['text']['mtime_ns'] = os.stat(os.path.join(save_location, record['text']['file'])).st_mtime_ns
+        manifest['dbs'][record['file']] = record
+        save_job_manifest(manifest_path, manifest)
+        dbs_done += 1
+        labels_done += record['rows']
+        if progress:
+            progress(dbs_done, labels_done)
+
+    def uploads_done(block=False):
+        """ chunk_done for every staged DB whose files have all been moved; with block, wait for the rest first """
+        for entry in list(staged):
+            db_uploads, record = entry
+            if block:
+                wait(db_uploads)
+            elif not all(upload.done() for upload in db_uploads):
+                continue
+            staged.remove(entry)
+            if all(upload.exception() is None for upload in db_uploads):
+                chunk_done(record)
+
+    def chunk_written(record):
+        if staging_dir is None:
+            chunk_done(record)
+            return
+        db_uploads = [uploader.submit(os.path.join(write_location, file_name), save_location) for file_name in db_record_files(record)]
+        uploads.extend((upload, record) for upload in db_uploads)
+        staged.append((db_uploads, record))
+        uploads_done()
+
+    try:
+        if executor is not None:
+            futures = {executor.submit(write_db_chunk, write_location, upc, *chunk, encoding, db_format): chunk for chunk in todo}
+            try:
+                for future in as_completed(futures):
+                    db_index, chunk_start, chunk_end = futures[future]
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        raise RuntimeError(f"DB{db_index + 1} failed: {str(e)}") from e
+                    chunk_written(record)
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+            finally:
+                # Cancel every chunk still queued before waiting on any, or the pool starts them while we wait;
+                # then wait for the chunks already running so a cancel can remove what they wrote
+                running = [future for future in futures if not future.cancel()]
+                handled = {record['file'] for upload, record in uploads} | {os.path.basename(path) for path in written}
+                for future in running:
+                    try:
+                        record = future.result()
+                    except Exception:
+                        continue
+                    if record['file'] not in handled:
+                        chunk_written(record)
+        else:
+            for db_index, chunk_start, chunk_end in todo:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                try:
+                    record = write_db_chunk(write_location, upc, db_index, chunk_start, chunk_end, encoding, db_format)
+                except Exception as e:
+                    raise RuntimeError(f"DB{db_index + 1} failed: {str(e)}") from e
+                chunk_written(record)
+    finally:
+        uploads_done(block=True)
+        if staging_dir is not None:
+            # Every upload has finished; anything left is a failed upload or a partial chunk, which a resume rewrites
+            shutil.rmtree(write_location, ignore_errors=True)
+
+    for upload, record in uploads:
+        if upload.exception() is not None:
+            raise RuntimeError(f"DB{record['db']} could not be moved to {save_location}: {str(upload.exception())}") from upload.exception()
+
+    if cancel_event is not None and cancel_event.is_set():
+        for file_path in written:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            manifest['dbs'].pop(os.path.basename(file_path), None)
+        save_job_manifest(manifest_path, manifest)
+        raise GenerationCancelled(len(written))
+    return all_files
+
+ROLL_PLAN_HEADER = ['Roll #', 'Qty', 'First Serial', 'Last Serial', 'First EPC', 'Last EPC', 'DB File', 'Continues In DB Files']
+
+# Joins the DB files a roll runs on into, in order, in the last column of the roll plan and roll index
+ROLL_FILE_SEPARATOR = ';'
+
+def db_extension(db_format):
+    """ Extension of the file a DB is known by: its xlsx, unless only the text database was written """
+    return 'txt' if db_format == 'text' else 'xlsx'
+
+def roll_db_chunks(start_serial, end_serial, qty_db, first, last):
+    """ (db_index, chunk_start, chunk_end) of every DB serials first .. last come from, in order """
+    for db_index in range((first - start_serial) // qty_db, (last - start_serial) // qty_db + 1):
+        chunk_start = start_serial + db_index * qty_db
+        yield db_index, chunk_start, min(chunk_start + qty_db - 1, end_serial)
+
+def roll_plan(upc, start_serial, end_serial, lpr, qty_db, encoding=DEFAULT_ENCODING, db_format='xlsx'):
+    """ Yield one row per roll: roll number, label count, first/last serial and EPC, and the DB file(s) it comes from
+
+    Rolls are cut every lpr labels from start_serial, so the last roll of the job may be short. When a roll spans
+    several DB files the last column names every file after the first, in order. """
+    template = epc_template(upc, *encoding)
+
+    for roll_index in range(math.ceil((end_serial - start_serial + 1) / lpr)):
+        first = start_serial + roll_index * lpr
+        last = min(first + lpr - 1, end_serial)
+        files = [db_file_name(upc, *chunk, db_extension(db_format)) for chunk in roll_db_chunks(start_serial, end_serial, qty_db, first, last)]
+        yield (
+            roll_index + 1, last - first + 1, first, last,
+            encode_epc(template, first), encode_epc(template, last),
+            files[0], ROLL_FILE_SEPARATOR.join(files[1:]) or None,
+        )
+
+def preview_rows(upc, start_serial, end_serial, lpr, qty_db, first_index, count, encoding=DEFAULT_ENCODING):
+    """ Rows first_index .. first_index + count - 1 of a job as (roll #, DB #, UPC, serial, EPC), encoded on demand """
+    first_serial = start_serial + max(first_index, 0)
+    count = max(0, min(count, end_serial - first_serial + 1))
+    epc_values = generate_epc_batch(upc, first_serial, count, encoding)
+    return [
+        ((serial - start_serial) // lpr + 1, (serial - start_serial) // qty_db + 1, upc, serial, epc)
+        for serial, epc in zip(range(first_serial, first_serial + count), epc_values)
+    ]
+
+def roll_plan_file_name(upc, start_serial, end_serial, extension='csv'):
+    return f"{upc}.RollPlan.{start_serial}-{end_serial}.{extension}"
+
+def write_roll_plan(file_path, upc, start_serial, end_serial, lpr, qty_db, encoding=DEFAULT_ENCODING, db_format='xlsx'):
+    """ Export the roll plan in one streaming pass; .xlsx paths get a sheet, anything else a CSV """
+    rows = roll_plan(upc, start_serial, end_serial, lpr, qty_db, encoding, db_format)
+    if file_path.lower().endswith('.xlsx'):
+        write_xlsx_rows(file_path, ROLL_PLAN_HEADER, rows, widths=[8, 8, 14, 14, 28, 28, 34, 34])
+    else:
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(ROLL_PLAN_HEADER)
+            writer.writerows(rows)
+    return file_path
+
+ROLL_INDEX_HEADER = ['Roll #', 'Qty', 'First Serial', 'Last Serial', 'DB File', 'Byte Offset', 'Continues In DB Files']
+
+def text_db_offset(upc, chunk_start, serial, epc_length):
+    """ Byte offset of a serial's row in the text database starting at chunk_start, from the row lengths alone
+
+    Every row is UPC,serial,EPC and CRLF, so rows only change length where the serial gains a digit. """
+    offset = len('UPC,Serial #,EPC\r\n') + (serial - chunk_start) * (len(upc) + epc_length + 4)
+    first = chunk_start
+    while first < serial:
+        digits = len(str(first))
+        last = min(serial, 10 ** digits)
+        offset += (last - first) * digits
+        first = last
+    return offset
+
+def roll_index(upc, start_serial, end_serial, lpr, qty_db, encoding=DEFAULT_ENCODING):
+    """ Yield one row per roll: roll number, label count, first/last serial, the text database it starts in and the
+    byte offset of its first row there, and every further text database it runs on into, in order """
+    template = epc_template(upc, *encoding)
+    epc_length = len(encode_epc(template, start_serial))
+
+    for roll in range(math.ceil((end_serial - start_serial + 1) / lpr)):
+        first = start_serial + roll * lpr
+        last = min(first + lpr - 1, end_serial)
+        chunks = list(roll_db_chunks(start_serial, end_serial, qty_db, first, last))
+        files = [db_file_name(upc, *chunk, 'txt') for chunk in chunks]
+        yield (
+            roll + 1, last - first + 1, first, last,
+            files[0], text_db_offset(upc, chunks[0][1], first, epc_length), ROLL_FILE_SEPARATOR.join(files[1:]) or None,
+        )
+
+def roll_index_file_name(upc, start_serial, end_serial):
+    return f"{upc}.RollIndex.{start_serial}-{end_serial}.csv"
+
+def write_roll_index(file_path, upc, start_serial, end_serial, lpr, qty_db, encoding=DEFAULT_ENCODING):
+    """ Export the roll index of a job's text databases, so reprinting a roll can seek straight to its rows """
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ROLL_INDEX_HEADER)
+        writer.writerows(roll_index(upc, start_serial, end_serial, lpr, qty_db, encoding))
+    return file_path
+
+def read_roll_rows(index_path, roll_number):
+    """ The text database lines of one roll, read by seeking to its offset from the roll index next to the DB files
+
+    A roll that spans DB files carries on from the first row of each following one, in order, until it has Qty lines.
+    Returns the lines without their CRLF. """
+    with open(index_path, newline='') as f:
+        entry = next((row for row in csv.DictReader(f) if row['Roll #'] == str(roll_number)), None)
+    if entry is None:
+        raise ValueError(f"Roll {roll_number} is not in {index_path}")
+    folder = os.path.dirname(index_path)
+    qty = int(entry['Qty'])
+    # Indexes written before rolls could span more than two DBs name the one they end in
+    following = entry.get('Continues In DB Files', entry.get('Ends In DB File')) or ''
+    lines = []
+    with open(os.path.join(folder, entry['DB File']), 'rb') as f:
+        f.seek(int(entry['Byte Offset']))
+        for line in itertools.islice(f, qty):
+            lines.append(line.rstrip(b'\r\n').decode('ascii'))
+    for file_name in filter(None, following.split(ROLL_FILE_SEPARATOR)):
+        if len(lines) >= qty:
+            break
+        with open(os.path.join(folder, file_name), 'rb') as f:
+            # Past the header line
+            for line in itertools.islice(f, 1, 1 + qty - len(lines)):
+                lines.append(line.rstrip(b'\r\n').decode('ascii'))
+    if len(lines) < qty:
+        raise ValueError(f"Roll {roll_number} should have {qty} labels but its DB files only hold {len(lines)}")
+    return lines
+
+XLSX_SHEET_RE = re.compile(r'<sheet\b[^>]*?r:id="([^"]+)"')
+XLSX_ROW_END = '</row>'
+XLSX_CELL_RE = re.compile(r'<c r="([A-Z]+)(\d+)"([^>]*?)(?:/>|>(?:<f>.*?</f>|<f[^>]*/>)?(?:<v>([^<]*)</v>|<is>(.*?)</is>)?</c>)', re.S)
+XLSX_TEXT_RE = re.compile(r'<t(?: [^>]*)?>(.*?)</t>', re.S)
+XLSX_COLUMNS = {chr(65 + i): i for i in range(26)}
+
+def xlsx_first_sheet(zf):
+    """ Resolve the part name of the workbook's first sheet """
+    workbook = zf.read('xl/workbook.xml').decode('utf-8')
+    rel_id = XLSX_SHEET_RE.search(workbook).group(1)
+    rels = zf.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+    for rel in re.finditer(r'<Relationship\b[^>]*>', rels):
+        if f'Id="{rel_id}"' in rel.group(0):
+            target = re.search(r'Target="([^"]+)"', rel.group(0)).group(1)
+            return target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    raise ValueError("Workbook has no sheets")
+
+def column_index(column):
+    index = 0
+    for letter in column:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+def iter_xlsx_rows(file_path, read_size=1 << 20):
+    """ Stream the first sheet of an xlsx file as lists of cell values, without loading the workbook
+
+    Handles both inline strings (write_db_xlsx) and shared strings (older pandas/openpyxl DB files). Numbers are
+    returned as int when they have no fractional part; rows without any cells are skipped. """
+    with zipfile.ZipFile(file_path) as zf:
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in zf.namelist():
+            text = zf.read('xl/sharedStrings.xml').decode('utf-8')
+            for si in re.finditer(r'<si>(.*?)</si>', text, re.S):
+                value = ''.join(XLSX_TEXT_RE.findall(si.group(1)))
+                shared_strings.append(unescape(value) if '&' in value else value)
+        with zf.open(xlsx_first_sheet(zf)) as sheet:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            pending = ''
+            current_row = None
+            values = []
+            while True:
+                data = sheet.read(read_size)
+                pending += decoder.decode(data, final=not data)
+                # Only parse up to the last complete row; the rest waits for the next read
+                end = pending.rfind(XLSX_ROW_END) if data else len(pending)
+                if end < 0:
+                    continue
+                text, pending = pending[:end], pending[end:]
+                for column, row_number, attributes, number, inline in XLSX_CELL_RE.findall(text):
+                    if row_number != current_row:
+                        if current_row is not None:
+                            yield values
+                        current_row = row_number
+                        values = []
+                    index = XLSX_COLUMNS[column] if len(column) == 1 else column_index(column)
+                    while len(values) < index:
+                        values.append(None)
+                    if inline:
+                        value = ''.join(XLSX_TEXT_RE.findall(inline))
+                        value = unescape(value) if '&' in value else value
+                    elif not number:
+                        value = None
+                    elif 't="s"' in attributes:
+                        value = shared_strings[int(number)]
+                    elif 't="' not in attributes or 't="n"' in attributes:
+                        value = float(number) if '.' in number or 'E' in number else int(number)
+                        if isinstance(value, float) and value.is_integer():
+                            value = int(value)
+                    else:
+                        value = unescape(number) if '&' in number else number
+                    values.append(value)
+                if not data:
+                    break
+            if current_row is not None:
+                yield values
+
+def iter_text_rows(file_path):
+    """ Stream a text database (write_db_delimited) as lists of values, with numeric Serial # values as int like the xlsx reader """
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield header
+        serial_column = header.index('Serial #') if 'Serial #' in header else 1
+        for row in reader:
+            if len(row) > serial_column and row[serial_column].isdigit():
+                row[serial_column] = int(row[serial_column])
+            yield row
+
+def iter_db_rows(file_path):
+    return iter_text_rows(file_path) if file_path.lower().endswith('.txt') else iter_xlsx_rows(file_path)
+
+DB_FILE_RE = re.compile(r'^(\d+)\.DB(\d+)\.(\d+)K-(\d+)K\.(xlsx|txt)$', re.I)
+
+def find_db_files(folder):
+    """ DB files in a folder grouped by UPC and sorted by DB number: {upc: [(db_number, path), ...]}
+
+    A DB written in both formats is listed once, as its xlsx file. """
+    found = {}
+    for file_path in glob.glob(os.path.join(glob.escape(folder), '*.DB*.*')):
+        match = DB_FILE_RE.match(os.path.basename(file_path))
+        if match and ((match.group(1), int(match.group(2))) not in found or match.group(5).lower() == 'xlsx'):
+            found[match.group(1), int(match.group(2))] = file_path
+    groups = {}
+    for (upc, db_number), file_path in sorted(found.items()):
+        groups.setdefault(upc, []).append((db_number, file_path))
+    return groups
+
+def verify_db_file(file_path, upc, max_issues=100, encoding=DEFAULT_ENCODING):
+    """ Check that every EPC in one DB file round-trips to its UPC and Serial # columns and that serials are contiguous
+
+    Returns (rows, errors, issues, first_serial, last_serial); at most max_issues problems are listed. """
+    template = epc_template(upc, *encoding)
+    rows = 0
+    errors = 0
+    issues = []
+    first_serial = None
+    next_serial = None
+
+    def issue(row_number, message):
+        nonlocal errors
+        errors += 1
+        if len(issues) < max_issues:
+            issues.append(f"{os.path.basename(file_path)} row {row_number}: {message}")
+
+    row_iter = iter_db_rows(file_path)
+    header = next(row_iter, None)
+    if header is None or [str(v).strip() if v is not None else '' for v in header[:3]] != ['UPC', 'Serial #', 'EPC']:
+        issue(1, f"unexpected header {header}")
+    for row_number, row in enumerate(row_iter, 2):
+        rows += 1
+        row_upc, serial, epc = (row + [None, None, None])[:3]
+        if row_upc != upc and not (isinstance(row_upc, int) and str(row_upc).zfill(len(upc)) == upc):
+            issue(row_number, f"UPC column {row_upc!r} does not match {upc}")
+        if not isinstance(serial, int):
+            issue(row_number, f"Serial # {serial!r} is not an integer")
+            continue
+        try:
+            expected = encode_epc(template, serial)
+        except ValueError as e:
+            issue(row_number, str(e))
+            continue
+        if epc != expected and str(epc).upper() != expected:
+            try:
+                decoded = decode_epc(str(epc))
+            except ValueError as e:
+                issue(row_number, str(e))
+            else:
+                if str(decoded['serial']) != str(serial):
+                    issue(row_number, f"EPC {epc} decodes to serial {decoded['serial']}, Serial # column is {serial}")
+                else:
+                    issue(row_number, f"EPC {epc} decodes to {decoded['scheme'].upper()} {decoded.get('gtin14', decoded.get('sscc'))} "
+                                      f"partition {decoded['partition']} filter {decoded['filter']}, expected {expected} for {upc}")
+        if next_serial is not None and serial != next_serial:
+            issue(row_number, f"serial {serial} breaks the range, expected {next_serial}")
+        if first_serial is None:
+            first_serial = serial
+        next_serial = serial + 1
+    return rows, errors, issues, first_serial, None if next_serial is None else next_serial - 1
+
+def job_encoding(folder, upc):
+    """ The encoding recorded in a folder's job manifest for this UPC, or the default for jobs from before it was """
+    for manifest_path in sorted(glob.glob(os.path.join(glob.escape(folder), f"{upc}.*.job.json"))):
+        manifest = load_job_manifest(manifest_path)
+        if manifest and manifest.get('encoding'):
+            return tuple(manifest['encoding'])
+    return DEFAULT_ENCODING
+
+def verify_job(folder, parallel=True, max_issues=100, encoding=None):
+    """ Decode every EPC in a folder's DB files and check it round-trips to the row's UPC and Serial #
+
+    Each UPC is checked against the encoding in its job manifest unless an encoding is given. Serials must also be contiguous across the DB files of each UPC. Files are checked across a process pool
+    when parallel is set. Returns a report dict; at most max_issues problems are listed but all are counted. """
+    report = {'files': 0, 'rows': 0, 'errors': 0, 'issues': [], 'ranges': {}}
+    groups = find_db_files(folder)
+    files = [(upc, db_number, file_path) for upc, upc_files in sorted(groups.items()) for db_number, file_path in upc_files]
+
+    def add_issue(message):
+        report['errors'] += 1
+        if len(report['issues']) < max_issues:
+            report['issues'].append(message)
+
+    encodings = {}
+    for upc in groups:
+        encodings[upc] = encoding or job_encoding(folder, upc)
+        try:
+            epc_template(upc, *encodings[upc])
+        except ValueError as e:
+            add_issue(f"{os.path.basename(groups[upc][0][1])}: file name UPC {upc}: {str(e)}")
+            del encodings[upc]
+    files = [entry for entry in files if entry[0] in encodings]
+
+    if parallel and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as executor:
+            results = list(executor.map(verify_db_file, [f[2] for f in files], [f[0] for f in files], [max_issues] * len(files),
+                                        [encodings[f[0]] for f in files]))
+    else:
+        results = [verify_db_file(file_path, upc, max_issues, encodings[upc]) for upc, db_number, file_path in files]
+
+    last_serials = {}
+    for (upc, db_number, file_path), (rows, errors, issues, first_serial, last_serial) in zip(files, results):
+        report['files'] += 1
+        report['rows'] += rows
+        report['errors'] += errors
+        report['issues'].extend(issues[:max_issues - len(report['issues'])])
+        if first_serial is None:
+            continue
+        previous = last_serials.get(upc)
+        if previous is not None and first_serial != previous + 1:
+            add_issue(f"{os.path.basename(file_path)}: DB{db_number} starts at serial {first_serial}, expected {previous + 1}")
+        last_serials[upc] = last_serial
+        report['ranges'][upc] = (report['ranges'].get(upc, (first_serial, None))[0], last_serial)
+    return report
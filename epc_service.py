@@ -0,0 +1,146 @@
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from epc_engine import XLSX_ROW_BLOCK, decode_epc, encode_epc, encode_epc_batch, epc_template, make_encoding
+from job_log import append_job_record
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+BATCH_FORMATS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+def request_encoding(params):
+    return make_encoding(params.get('scheme'), params.get('partition'), params.get('filter'))
+
+def request_serial(params, name):
+    value = params.get(name, '').strip()
+    if not value.isdigit():
+        raise ValueError(f"{name} must be a whole number.")
+    return int(value)
+
+def encode_request(params):
+    """ /encode?upc=...&serial=...[&scheme=&partition=&filter=] """
+    upc = params.get('upc', '').strip()
+    encoding = request_encoding(params)
+    template = epc_template(upc, *encoding)
+    serial = params.get('serial', '').strip()
+    # SGTIN-198 serials may be alphanumeric; every other scheme takes a number
+    if not template[5] or serial.isdigit():
+        serial = request_serial(params, 'serial')
+    return {'upc': upc, 'serial': serial, 'epc': encode_epc(template, serial), 'scheme': encoding[0],
+            'partition': encoding[1], 'filter': encoding[2]}
+
+def batch_blocks(upc, start_serial, end_serial, output_format, encoding):
+    """ The rows of a batch response, a block of XLSX_ROW_BLOCK serials at a time, each block one encoded chunk """
+    template = epc_template(upc, *encoding)
+    if output_format == 'csv':
+        yield 'UPC,Serial #,EPC\r\n'.encode()
+    for block_start in range(start_serial, end_serial + 1, XLSX_ROW_BLOCK):
+        block_count = min(XLSX_ROW_BLOCK, end_serial - block_start + 1)
+        serials = range(block_start, block_start + block_count)
+        epc_values = encode_epc_batch(template, block_start, block_count)
+        if output_format == 'csv':
+            yield ''.join(f'{upc},{sn},{epc}\r\n' for sn, epc in zip(serials, epc_values)).encode()
+        else:
+            yield ''.join(f'{{"upc":"{upc}","serial":{sn},"epc":"{epc}"}}\n' for sn, epc in zip(serials, epc_values)).encode()
+
+class EPCRequestHandler(BaseHTTPRequestHandler):
+    """ GET /encode, /decode and /batch; see the README for the parameters """
+    protocol_version = 'HTTP/1.1'
+    server_version = 'UPC2EPC'
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/encode':
+                self.send_json(200, encode_request(params))
+            elif url.path == '/decode':
+                self.send_json(200, decode_epc(params.get('epc', '')))
+            elif url.path == '/batch':
+                self.send_batch(params)
+            elif url.path == '/health':
+                self.send_json(200, {'status': 'ok'})
+            else:
+                self.send_json(404, {'error': f"Unknown path {url.path}, expected /encode, /decode or /batch"})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+
+    def send_batch(self, params):
+        """ /batch?upc=...&start=...&end=...[&format=csv|ndjson&scheme=&partition=&filter=]
+
+        Rows are encoded and sent as chunks while the client reads them, so printing can start on the first block
+        and memory does not grow with the range. Every parameter is checked before the 200 goes out. """
+        upc = params.get('upc', '').strip()
+        start_serial = request_serial(params, 'start')
+        end_serial = request_serial(params, 'end')
+        output_format = params.get('format', 'csv').strip().lower()
+        encoding = request_encoding(params)
+        if output_format not in BATCH_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(BATCH_FORMATS)}")
+        max_serial = epc_template(upc, *encoding)[4]
+        if end_serial < start_serial or end_serial > max_serial:
+            raise ValueError(f"end must be between start and {max_serial}.")
+
+        started = time.monotonic()
+        status = 'done'
+        self.send_response(200)
+        self.send_header('Content-Type', BATCH_FORMATS[output_format])
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('X-Label-Count', str(end_serial - start_serial + 1))
+        self.end_headers()
+        try:
+            for block in batch_blocks(upc, start_serial, end_serial, output_format, encoding):
+                self.wfile.write(b'%X\r\n%s\r\n' % (len(block), block))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The station hung up, so there is nothing more to send it on this connection
+            status = 'disconnected'
+            self.close_connection = True
+        seconds = time.monotonic() - started
+        labels = end_serial - start_serial + 1
+        append_job_record({
+            'kind': 'service_batch', 'status': status, 'upc': upc, 'start_serial': start_serial, 'end_serial': end_serial,
+            'total_qty': labels, 'format': output_format, 'client': self.client_address[0], 'seconds': round(seconds, 3),
+            'labels_per_sec': round(labels / seconds) if seconds > 0 and status == 'done' else None,
+        })
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, quiet=False):
+    """ A threaded server, one thread per connection so several print stations can stream at once; port 0 picks one """
+    server = ThreadingHTTPServer((host, port), EPCRequestHandler)
+    server.quiet = quiet
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service encoding and decoding EPCs for print stations")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST}, this machine only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--quiet', action='store_true', help="Don't log each request")
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port, args.quiet)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import csv
+import datetime
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import directory_index
+from epc_engine import is_valid_code
+
+ORDER_COLUMNS = ['customer', 'label_size', 'ticket', 'po', 'upc']
+REPORT_COLUMNS = ['line'] + ORDER_COLUMNS + ['status', 'folder', 'message']
+
+def template_path(template_base_path, customer, label_size):
+    return os.path.join(template_base_path, customer, label_size, f"Template {label_size}.btw")
+
+def upc_folder_path(base_path, order, date=None):
+    """ <customer>/<label size>/MM.DD.YY - PO - Ticket/<UPC>, the same layout create_job_folder makes """
+    folder_name = f"{(date or datetime.datetime.now()).strftime('%m.%d.%y')} - {order['po']} - {order['ticket']}"
+    return os.path.join(base_path, order['customer'], order['label_size'], folder_name, order['upc'])
+
+def read_orders(orders_path):
+    """ Orders from a CSV with the ORDER_COLUMNS; each keeps its line number for error messages """
+    orders = []
+    with open(orders_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+        missing = [column for column in ORDER_COLUMNS if column not in fields]
+        if missing:
+            raise ValueError(f"Orders file is missing column(s): {', '.join(missing)}")
+        for line_number, row in enumerate(reader, 2):
+            order = {column: (row[fields[column]] or '').strip() for column in ORDER_COLUMNS}
+            if any(order.values()):
+                order['line'] = line_number
+                orders.append(order)
+    return orders
+
+def validate_orders(orders, index):
+    """ Check every order against the cached directory index before anything is created on the share
+
+    Returns (valid orders, problems). The index is the one the Job Creator dropdowns use, so a customer, label size
+    or template missing from it is reported without touching the share. """
+    valid = []
+    problems = []
+    seen = set()
+    customers = set(directory_index.customers(index))
+    for order in orders:
+        where = f"Line {order['line']}"
+        if not all(order[column] for column in ORDER_COLUMNS):
+            problems.append(f"{where}: every column is required")
+        elif order['customer'] not in customers:
+            problems.append(f"{where}: customer {order['customer']!r} not found")
+        elif order['label_size'] not in (directory_index.label_sizes(index, order['customer']) or []):
+            problems.append(f"{where}: label size {order['label_size']!r} not found for {order['customer']}")
+        elif f"Template {order['label_size']}.btw" not in directory_index.templates(index, order['customer'], order['label_size']):
+            problems.append(f"{where}: no 'Template {order['label_size']}.btw' for {order['customer']} / {order['label_size']}")
+        elif not is_valid_code(order['upc']):
+            problems.append(f"{where}: UPC {order['upc']!r} must be 12, 13 or 14 digits")
+        elif (order['customer'], order['label_size'], order['po'], order['ticket'], order['upc']) in seen:
+            problems.append(f"{where}: duplicate of an earlier order")
+        else:
+            seen.add((order['customer'], order['label_size'], order['po'], order['ticket'], order['upc']))
+            valid.append(order)
+    return valid, problems
+
+def read_template(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def provision_order(base_path, order, template_data, date):
+    """ Create one UPC's print and data folders and write its template copy under a temporary name, then rename it """
+    upc_folder = upc_folder_path(base_path, order, date)
+    print_folder = os.path.join(upc_folder, "print")
+    os.makedirs(print_folder, exist_ok=True)
+    os.makedirs(os.path.join(upc_folder, "data"), exist_ok=True)
+    dest_path = os.path.join(print_folder, f"{order['upc']}.btw")
+    temp_path = os.path.join(print_folder, f".{order['upc']}.btw.{os.getpid()}-{threading.get_ident()}.partial")
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(template_data)
+        os.replace(temp_path, dest_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return upc_folder
+
+def create_jobs(orders, base_path, template_base_path, workers=8, progress=None):
+    """ Provision every order on a bounded pool of threads; returns one result dict per order
+
+    Each distinct template is read from the share once and written to every order that uses it.
+    progress(orders_done, orders_total) is called as orders finish. """
+    date = datetime.datetime.now()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-creator') as executor:
+        paths = {template_path(template_base_path, order['customer'], order['label_size']) for order in orders}
+        reads = {path: executor.submit(read_template, path) for path in paths}
+        futures = []
+        for order in orders:
+            read = reads[template_path(template_base_path, order['customer'], order['label_size'])]
+            if read.exception() is not None:
+                results.append(dict(order, status='failed', folder='', message=f"Template could not be read: {str(read.exception())}"))
+                continue
+            futures.append((order, executor.submit(provision_order, base_path, order, read.result(), date)))
+        for order, future in futures:
+            try:
+                results.append(dict(order, status='created', folder=future.result(), message=''))
+            except Exception as e:
+                results.append(dict(order, status='failed', folder=upc_folder_path(base_path, order, date), message=str(e)))
+            if progress:
+                progress(len(results), len(orders))
+    results.sort(key=lambda result: result['line'])
+    return results
+
+def write_report(report_path, results, problems=()):
+    """ One row per order with its outcome, followed by the orders that failed validation """
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, REPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+        for problem in problems:
+            writer.writerow({'status': 'skipped', 'message': problem})
+    return report_path
@@ -0,0 +1,93 @@
+import datetime
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+
+# One JSON record per job, rotated to job_log.jsonl.1, .2, ... once it grows past JOB_LOG_MAX_BYTES
+JOB_LOG_PATH = os.path.join(os.path.expanduser('~'), '.upc2epc', 'job_log.jsonl')
+JOB_LOG_MAX_BYTES = 5 * 1024 * 1024
+JOB_LOG_BACKUPS = 3
+
+log_lock = threading.Lock()
+
+@contextmanager
+def timed(phases, name):
+    """ Add the time spent in the with block to phases[name], in seconds """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = round(phases.get(name, 0) + time.perf_counter() - started, 4)
+
+def rotate_log(log_path, backups):
+    for number in range(backups - 1, 0, -1):
+        older = f"{log_path}.{number}"
+        if os.path.exists(older):
+            os.replace(older, f"{log_path}.{number + 1}")
+    os.replace(log_path, f"{log_path}.1")
+
+def append_job_record(record, log_path=JOB_LOG_PATH, max_bytes=JOB_LOG_MAX_BYTES, backups=JOB_LOG_BACKUPS):
+    """ Append one job record as a JSON line, stamped with the time and machine; never raises, the job already ran """
+    record = dict(record, logged_at=datetime.datetime.now().isoformat(timespec='seconds'), machine=platform.node())
+    try:
+        with log_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            if os.path.exists(log_path) and os.path.getsize(log_path) >= max_bytes:
+                rotate_log(log_path, backups)
+            with open(log_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+    except OSError:
+        pass
+    return record
+
+def recent_jobs(limit=100, log_path=JOB_LOG_PATH, kind=None):
+    """ The newest `limit` records, newest first, reading back into the rotated files only when needed """
+    records = []
+    for path in [log_path, f"{log_path}.1"]:
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except OSError:
+            continue
+        for line in reversed(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if kind is None or record.get('kind') == kind:
+                records.append(record)
+                if len(records) >= limit:
+                    return records
+    return records
+
+def db_stats(manifest):
+    """ Per DB timings and sizes out of a job manifest, for the job record """
+    return [
+        {key: record.get(key) for key in ('file', 'rows', 'size', 'encode_seconds', 'write_seconds', 'checksum_seconds')}
+        for record in sorted((manifest or {}).get('dbs', {}).values(), key=lambda record: record['db'])
+    ]
+
+def generation_record(job, status, seconds, phases, manifest=None, **extra):
+    """ The log record of one Database Generator job """
+    dbs = db_stats(manifest)
+    return dict(
+        extra,
+        kind='generate',
+        status=status,
+        upc=job['upc'],
+        start_serial=job['start_serial'],
+        end_serial=job['end_serial'],
+        total_qty=job['total_qty'],
+        qty_db=job['qty_db'],
+        output=job.get('save_location') or job.get('output_dir'),
+        seconds=round(seconds, 3),
+        labels_per_sec=round(job['total_qty'] / seconds) if seconds > 0 and status == 'done' else None,
+        encode_seconds=round(sum(db['encode_seconds'] or 0 for db in dbs), 3),
+        write_seconds=round(sum(db['write_seconds'] or 0 for db in dbs), 3),
+        bytes=sum(db['size'] or 0 for db in dbs),
+        phases=phases,
+        dbs=dbs,
+    )
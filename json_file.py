@@ -0,0 +1,19 @@
+import json
+import os
+
+
+def load_json(file_path):
+    """ The JSON document in file_path, or None when it is missing or unreadable """
+    try:
+        with open(file_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_json(file_path, data, indent=None):
+    """ Replace file_path atomically so a crash never leaves it half written; creates its folder if needed """
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(temp_path, file_path)
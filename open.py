@@ -1,8 +1,6 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import pandas as pd
-import openpyxl
-import os
+from epc_engine import RANGE_FORMATS, write_range
 
 def select_save_location():
     folder_selected = filedialog.askdirectory()
@@ -10,41 +8,12 @@ def select_save_location():
         save_location_entry.delete(0, tk.END)
         save_location_entry.insert(0, folder_selected)
 
-def dec_to_bin(value, length):
-    return bin(int(value))[2:].zfill(length)
-
-def bin_to_hex(binary_str):
-    hex_str = hex(int(binary_str, 2))[2:].upper()
-    return hex_str.zfill(len(binary_str) // 4)
-
-def generate_epc(upc, serial_number):
-    # Extract GS1 Company Prefix, Item Reference Number, and Check Digit
-    gs1_company_prefix = "0" + upc[:6]
-    item_reference_number = upc[6:11]
-
-    # Form GTIN-14
-    gtin14 = "0" + gs1_company_prefix + item_reference_number
-
-    # Binary SGTIN-96 parts
-    header = "00110000"
-    filter_value = "001"
-    partition = "101"
-    gs1_binary = dec_to_bin(gs1_company_prefix, 24)
-    item_reference_binary = dec_to_bin(item_reference_number, 20)
-    serial_binary = dec_to_bin(serial_number, 38)
-
-    # Concatenate all parts to form the full binary SGTIN-96
-    epc_binary = header + filter_value + partition + gs1_binary + item_reference_binary + serial_binary
-
-    # Convert binary EPC to hexadecimal
-    epc_hex = bin_to_hex(epc_binary)
-    return epc_hex
-
 def generate_file():
     upc = upc_entry.get().strip()
     start_serial = serial_start_entry.get().strip()
     end_serial = serial_end_entry.get().strip()
     save_location = save_location_entry.get().strip()
+    max_rows = max_rows_entry.get().strip()
 
     if not upc or not start_serial or not end_serial or not save_location:
         messagebox.showerror("Input Error", "All fields are required.")
@@ -53,36 +22,22 @@ def generate_file():
     try:
         start_serial = int(start_serial)
         end_serial = int(end_serial)
+        max_rows = int(max_rows) if max_rows else None
     except ValueError:
-        messagebox.showerror("Input Error", "Serial numbers must be integers.")
+        messagebox.showerror("Input Error", "Serial numbers and max rows must be integers.")
         return
 
     if start_serial > end_serial:
         messagebox.showerror("Input Error", "Starting serial number must be less than or equal to the ending serial number.")
         return
 
-    num_serials = end_serial - start_serial + 1
-    file_name = f"{upc}_{num_serials}.xlsx"
-    file_path = os.path.join(save_location, file_name)
-
     try:
-        # Load the baseline conversion file
-        df = pd.read_excel('UPC2EPC.xlsx', sheet_name='Sheet1')
-        
-        # Create new data for the specified range
-        serial_numbers = list(range(start_serial, end_serial + 1))
-        epc_values = [generate_epc(upc, sn) for sn in serial_numbers]
-        
-        # Populate the DataFrame with the new data
-        df = pd.DataFrame({
-            'UPC': [upc] * num_serials,
-            'Serial #': serial_numbers,
-            'EPC': epc_values
-        })
-
-        # Save the updated file
-        df.to_excel(file_path, index=False)
-        messagebox.showinfo("Success", f"File saved successfully: {file_path}")
+        # Streams the range to disk, splitting it into several files at Excel's row limit or the max rows given
+        written = write_range(upc, start_serial, end_serial, save_location, format_var.get(), max_rows)
+        if len(written) == 1:
+            messagebox.showinfo("Success", f"File saved successfully: {written[0]}")
+        else:
+            messagebox.showinfo("Success", f"{len(written)} files saved successfully in: {save_location}")
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
@@ -107,6 +62,14 @@ save_location_entry = tk.Entry(root, width=40)
 save_location_entry.grid(row=3, column=1, padx=10, pady=10)
 tk.Button(root, text="Browse...", command=select_save_location).grid(row=3, column=2, padx=10, pady=10)
 
-tk.Button(root, text="Generate File", command=generate_file).grid(row=4, column=0, columnspan=3, pady=20)
+tk.Label(root, text="Format:").grid(row=4, column=0, padx=10, pady=10)
+format_var = tk.StringVar(value='xlsx')
+tk.OptionMenu(root, format_var, *RANGE_FORMATS).grid(row=4, column=1, sticky="w", padx=10, pady=10)
+
+tk.Label(root, text="Max Rows per File:").grid(row=5, column=0, padx=10, pady=10)
+max_rows_entry = tk.Entry(root)
+max_rows_entry.grid(row=5, column=1, padx=10, pady=10)
+
+tk.Button(root, text="Generate File", command=generate_file).grid(row=6, column=0, columnspan=3, pady=20)
 
 root.mainloop()
@@ -0,0 +1,148 @@
+import csv
+import math
+import re
+
+from epc_engine import DEFAULT_ENCODING, db_extension, db_file_name, decode_epc, encode_epc, epc_template
+
+# Runs of serials in the read count bitmap: never read, and read more than once
+MISSING_RE = re.compile(b'\x00+')
+DUPLICATE_RE = re.compile(b'[\x02-\xff]+')
+HEX_RE = re.compile(r'^[0-9A-Fa-f]{24,52}$')
+
+def open_read_log(log_path):
+    """ Yield the EPC of every line of a reader / verification station log
+
+    The delimiter is sniffed and the EPC column is the first header containing 'EPC', or else the first column
+    holding a hex value in the first row. """
+    with open(log_path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        first = next(reader, None)
+        if first is None:
+            return
+        column = next((i for i, name in enumerate(first) if 'EPC' in name.upper()), None)
+        if column is None:
+            # No header, so the first line is already a read
+            column = next((i for i, field in enumerate(first) if HEX_RE.match(field.strip())), 0)
+            if len(first) > column:
+                yield first[column]
+        for row in reader:
+            if len(row) > column:
+                yield row[column]
+
+def reconcile_reads(epcs, upc, start_serial, end_serial, encoding=DEFAULT_ENCODING):
+    """ Count every EPC read against the job's serial range in a one-byte-per-serial bitmap
+
+    Returns (counts, unexpected, reads): counts[i] is how often start_serial + i was read (capped at 255);
+    unexpected maps what each foreign EPC was ('out of range', a GTIN, or 'not an EPC') to how often it was seen. """
+    template = epc_template(upc, *encoding)
+    head, tail, tail_format, serial_shift, max_serial, alphanumeric = template
+    head_length = len(head)
+    epc_length = head_length + int(tail_format[1:-1])
+    total = end_serial - start_serial + 1
+    counts = bytearray(total)
+    unexpected = {}
+    reads = 0
+    serial_mask = (1 << serial_shift) - 1
+    for epc in epcs:
+        epc = epc.strip().upper()
+        if not epc:
+            continue
+        reads += 1
+        index = -1
+        same_item = False
+        if epc.startswith(head) and not alphanumeric:
+            try:
+                offset = int(epc[head_length:], 16) - tail
+            except ValueError:
+                offset = -1
+            # The tail also holds the low item reference bits, so an offset outside the serial range is another GTIN
+            if 0 <= offset and offset >> serial_shift <= max_serial and not offset & serial_mask and len(epc) == epc_length:
+                same_item = True
+                index = (offset >> serial_shift) - start_serial
+        elif epc.startswith(head):
+            # A garbled serial may not decode, or may hold characters outside the SGTIN-198 set and not re-encode
+            try:
+                decoded = decode_epc(epc)
+                serial = str(decoded['serial'])
+                same_item = encode_epc(template, decoded['serial']) == epc
+            except ValueError:
+                serial = ''
+            if same_item and serial.isdigit() and serial == str(int(serial)):
+                index = int(serial) - start_serial
+        if 0 <= index < total:
+            if counts[index] < 255:
+                counts[index] += 1
+            continue
+        if same_item:
+            kind = 'out of range'
+        else:
+            try:
+                decoded = decode_epc(epc)
+                kind = decoded.get('gtin14') or decoded.get('sscc')
+            except ValueError:
+                kind = 'not an EPC'
+        unexpected[kind] = unexpected.get(kind, 0) + 1
+    return counts, unexpected, reads
+
+def serial_runs(pattern, counts, start_serial, offset=0):
+    """ [(first serial, last serial), ...] of the bitmap runs matching pattern """
+    return [(start_serial + offset + m.start(), start_serial + offset + m.end() - 1) for m in pattern.finditer(counts)]
+
+def format_runs(runs, limit=20):
+    text = ', '.join(str(first) if first == last else f"{first}-{last}" for first, last in runs[:limit])
+    return text + (f" and {len(runs) - limit} more" if len(runs) > limit else '')
+
+def reconcile_log(log_paths, upc, start_serial, end_serial, lpr, qty_db, encoding=DEFAULT_ENCODING, db_format='xlsx'):
+    """ Compare reader logs against a generated job; returns a report dict with per-DB and per-roll breakdowns
+
+    Every serial of the job is missing (never read), read once, or duplicated (read more than once); every other
+    EPC in the logs is unexpected. The set operations run over the bitmap in C (bytes.count and regex runs)
+    rather than over Python sets of EPC strings. """
+    counts, unexpected, reads = reconcile_reads(
+        (epc for log_path in log_paths for epc in open_read_log(log_path)), upc, start_serial, end_serial, encoding)
+    total = len(counts)
+
+    def summary(first_index, last_index):
+        part = counts[first_index:last_index + 1]
+        duplicates = serial_runs(DUPLICATE_RE, part, start_serial, first_index)
+        missing = part.count(0)
+        return {
+            'first_serial': start_serial + first_index,
+            'last_serial': start_serial + last_index,
+            'missing': missing,
+            'duplicated': sum(last - first + 1 for first, last in duplicates),
+            'extra_reads': sum(part) - (len(part) - missing) if duplicates else 0,
+            'missing_runs': serial_runs(MISSING_RE, part, start_serial, first_index),
+            'duplicate_runs': duplicates,
+        }
+
+    dbs = []
+    for db_index in range(math.ceil(total / qty_db)):
+        first_index = db_index * qty_db
+        last_index = min(first_index + qty_db, total) - 1
+        dbs.append(dict(summary(first_index, last_index), db=db_index + 1,
+                        file=db_file_name(upc, db_index, start_serial + first_index, start_serial + last_index, db_extension(db_format))))
+    rolls = []
+    for roll_index in range(math.ceil(total / lpr)):
+        first_index = roll_index * lpr
+        last_index = min(first_index + lpr, total) - 1
+        rolls.append(dict(summary(first_index, last_index), roll=roll_index + 1, db=first_index // qty_db + 1))
+    missing = counts.count(0)
+    return {
+        'reads': reads,
+        'expected': total,
+        'read': total - missing,
+        'missing': missing,
+        'duplicated': sum(db['duplicated'] for db in dbs),
+        'extra_reads': sum(db['extra_reads'] for db in dbs),
+        'unexpected': sum(unexpected.values()),
+        'unexpected_by_kind': unexpected,
+        'dbs': dbs,
+        'rolls': rolls,
+    }
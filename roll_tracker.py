@@ -0,0 +1,101 @@
+import datetime
+import os
+import re
+import tempfile
+import zipfile
+
+# Filled-in Roll Trackers go here, one uniquely named file per job
+ROLL_TRACKER_OUTPUT_PATH = os.path.join(tempfile.gettempdir(), 'upc2epc-roll-trackers')
+
+SHEET_RE = re.compile(r'<sheet\b[^>]*?/>')
+RELATIONSHIP_RE = re.compile(r'<Relationship\b[^>]*?/>')
+
+def attribute(tag, name):
+    match = re.search(rf'\b{name}="([^"]*)"', tag)
+    return match.group(1) if match else None
+
+def sheet_parts(zf):
+    """ [(sheet name, part name inside the zip), ...] in workbook tab order """
+    rels = {}
+    for rel in RELATIONSHIP_RE.findall(zf.read('xl/_rels/workbook.xml.rels').decode('utf-8')):
+        target = attribute(rel, 'Target')
+        rels[attribute(rel, 'Id')] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    sheets = []
+    for sheet in SHEET_RE.findall(zf.read('xl/workbook.xml').decode('utf-8')):
+        sheets.append((attribute(sheet, 'name'), rels[attribute(sheet, 'r:id')]))
+    return sheets
+
+def set_cell_value(sheet_xml, cell, value):
+    """ Put a number in an existing cell; a formula in the cell is kept and only its cached value changes """
+    pattern = re.compile(rf'<c r="{cell}"((?:\s+[^>]*?)?)(?:/>|>(.*?)</c>)', re.S)
+    match = pattern.search(sheet_xml)
+    if not match:
+        raise ValueError(f"Cell {cell} not found in the Roll Tracker's Input sheet")
+    attributes = re.sub(r'\s+t="[^"]*"', '', match.group(1) or '')
+    formula = re.search(r'<f\b.*?(?:</f>|/>)', match.group(2) or '', re.S)
+    new_cell = f'<c r="{cell}"{attributes}>{formula.group(0) if formula else ""}<v>{value}</v></c>'
+    return sheet_xml[:match.start()] + new_cell + sheet_xml[match.end():]
+
+def set_tab_selected(sheet_xml, selected):
+    view = re.search(r'<sheetView\b[^>]*?>', sheet_xml)
+    if not view:
+        return sheet_xml
+    tag = re.sub(r'\s+tabSelected="[^"]*"', '', view.group(0))
+    if selected:
+        tag = tag.replace('<sheetView', '<sheetView tabSelected="1"', 1)
+    return sheet_xml[:view.start()] + tag + sheet_xml[view.end():]
+
+def set_workbook_view(workbook_xml, active_tab):
+    """ Open on active_tab and have Excel recalculate every formula from the new inputs on load """
+    view = re.search(r'<workbookView\b[^>]*?/?>', workbook_xml)
+    if view:
+        tag = re.sub(r'\s+activeTab="[^"]*"', '', view.group(0))
+        tag = tag.replace('<workbookView', f'<workbookView activeTab="{active_tab}"', 1)
+        workbook_xml = workbook_xml[:view.start()] + tag + workbook_xml[view.end():]
+    calc = re.search(r'<calcPr\b[^>]*?/?>', workbook_xml)
+    if calc:
+        tag = re.sub(r'\s+fullCalcOnLoad="[^"]*"', '', calc.group(0))
+        tag = tag.replace('<calcPr', '<calcPr fullCalcOnLoad="1"', 1)
+        workbook_xml = workbook_xml[:calc.start()] + tag + workbook_xml[calc.end():]
+    return workbook_xml
+
+def patch_workbook(template_path, output_path, sheet_name, cells, active_sheet):
+    """ Copy an xlsx, setting `cells` on `sheet_name` and making `active_sheet` the open tab
+
+    Only the target sheet, the active sheet's view and workbook.xml are rewritten; every other part (formulas,
+    styles, images, calc chain) is copied through as is. """
+    with zipfile.ZipFile(template_path) as zin:
+        sheets = sheet_parts(zin)
+        parts = dict(sheets)
+        if sheet_name not in parts or active_sheet not in parts:
+            raise ValueError(f"The Roll Tracker needs '{sheet_name}' and '{active_sheet}' sheets")
+        active_tab = [name for name, part in sheets].index(active_sheet)
+        temp_path = output_path + '.tmp'
+        with zipfile.ZipFile(temp_path, 'w') as zout:
+            for item in zin.infolist():
+                data = zin.read(item.filename)
+                if item.filename == 'xl/workbook.xml':
+                    data = set_workbook_view(data.decode('utf-8'), active_tab).encode('utf-8')
+                elif item.filename in parts.values():
+                    sheet_xml = data.decode('utf-8')
+                    if item.filename == parts[sheet_name]:
+                        for cell, value in cells.items():
+                            sheet_xml = set_cell_value(sheet_xml, cell, value)
+                    sheet_xml = set_tab_selected(sheet_xml, item.filename == parts[active_sheet])
+                    data = sheet_xml.encode('utf-8')
+                zout.writestr(item, data)
+    os.replace(temp_path, output_path)
+
+def fill_roll_tracker(template_path, upc, start_serial, end_serial, lpr, total_qty, qty_db, output_dir=ROLL_TRACKER_OUTPUT_PATH):
+    """ Write a copy of the Roll Tracker with the job's inputs filled in and the HEX sheet open; returns its path """
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    output_path = os.path.join(output_dir, f"Roll Tracker {upc} {start_serial}-{end_serial} {stamp}.xlsx")
+    patch_workbook(template_path, output_path, 'Input', {
+        'D3': lpr,
+        'D4': total_qty,
+        'D5': start_serial,
+        'D8': end_serial,
+        'D10': qty_db,
+    }, 'HEX')
+    return output_path
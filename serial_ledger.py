@@ -0,0 +1,114 @@
+import datetime
+import os
+import sqlite3
+from contextlib import closing
+
+from epc_engine import DB_FILE_RE, normalize_gtin
+
+# Local ledger of every serial range handed out, so a new job can be checked against earlier ones for the same UPC
+LEDGER_PATH = os.path.join(os.path.expanduser('~'), '.upc2epc', 'serial_ledger.db')
+
+def ledger_upc(code):
+    """ The ledger key of a code: a UPC-A, EAN-13 or GTIN-14 as its GTIN-14, since all three encode the same EPCs """
+    code = str(code).strip()
+    try:
+        return normalize_gtin(code)
+    except ValueError:
+        return code
+
+def connect_ledger(ledger_path=LEDGER_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(ledger_path)), exist_ok=True)
+    conn = sqlite3.connect(ledger_path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS serial_ranges (
+            id INTEGER PRIMARY KEY,
+            upc TEXT NOT NULL,
+            start_serial INTEGER NOT NULL,
+            end_serial INTEGER NOT NULL,
+            job_folder TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'generate',
+            UNIQUE (upc, start_serial, end_serial, job_folder)
+        )
+    ''')
+    # Overlap checks look for ranges ending at or after the new start; new jobs sit at the top of a UPC's history,
+    # so this index only touches the few most recent ranges however long the history grows
+    conn.execute('CREATE INDEX IF NOT EXISTS serial_ranges_upc_end ON serial_ranges (upc, end_serial, start_serial)')
+    (version,) = conn.execute('PRAGMA user_version').fetchone()
+    if version < 1:
+        # Ledgers from before GTIN-14 / EAN-13 support keyed ranges on the code as typed
+        conn.create_function('ledger_upc', 1, ledger_upc)
+        with conn:
+            conn.execute('UPDATE OR IGNORE serial_ranges SET upc = ledger_upc(upc) WHERE upc != ledger_upc(upc)')
+            # Whatever could not be renamed already exists under its GTIN-14
+            conn.execute('DELETE FROM serial_ranges WHERE upc != ledger_upc(upc)')
+            conn.execute('PRAGMA user_version = 1')
+    return conn
+
+def record_range(upc, start_serial, end_serial, job_folder, created_at=None, source='generate', ledger_path=LEDGER_PATH):
+    created_at = created_at or datetime.datetime.now().isoformat(timespec='seconds')
+    with closing(connect_ledger(ledger_path)) as conn, conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO serial_ranges (upc, start_serial, end_serial, job_folder, created_at, source) VALUES (?, ?, ?, ?, ?, ?)',
+            (ledger_upc(upc), start_serial, end_serial, job_folder, created_at, source),
+        )
+
+def find_overlaps(upc, start_serial, end_serial, ledger_path=LEDGER_PATH):
+    """ Earlier ranges for this UPC that share at least one serial with start_serial..end_serial, oldest first """
+    with closing(connect_ledger(ledger_path)) as conn:
+        rows = conn.execute(
+            'SELECT start_serial, end_serial, job_folder, created_at, source FROM serial_ranges '
+            'WHERE upc = ? AND end_serial >= ? AND start_serial <= ? ORDER BY created_at',
+            (ledger_upc(upc), start_serial, end_serial),
+        ).fetchall()
+    return [dict(zip(('start_serial', 'end_serial', 'job_folder', 'created_at', 'source'), row)) for row in rows]
+
+def next_free_serial(upc, ledger_path=LEDGER_PATH):
+    """ First serial after every range recorded for this UPC, or 1 for a new UPC """
+    with closing(connect_ledger(ledger_path)) as conn:
+        (last_serial,) = conn.execute('SELECT MAX(end_serial) FROM serial_ranges WHERE upc = ?', (ledger_upc(upc),)).fetchone()
+    return 1 if last_serial is None else last_serial + 1
+
+def describe_overlaps(overlaps, limit=10):
+    lines = []
+    for overlap in overlaps[:limit]:
+        estimated = " (estimated from file names)" if overlap['source'] == 'import' else ""
+        lines.append(f"{overlap['start_serial']}-{overlap['end_serial']} on {overlap['created_at'][:10]}{estimated}: {overlap['job_folder']}")
+    if len(overlaps) > limit:
+        lines.append(f"...and {len(overlaps) - limit} more")
+    return "\n".join(lines)
+
+def import_share(base_path, ledger_path=LEDGER_PATH):
+    """ One-time backfill of the ledger from the {upc}.DB{n}.{a}K-{b}K.xlsx (or .txt) files already on the share
+
+    The file names only carry thousands, so each job folder's range is estimated as a*1000 + 1 to b*1000 from its
+    lowest and highest DB, which is exact for the usual ranges that start just after a thousand and end on one.
+    Re-running the import does not add duplicates. Returns the number of job ranges found. """
+    jobs = {}
+    for dirpath, dirnames, filenames in os.walk(base_path):
+        for filename in filenames:
+            match = DB_FILE_RE.match(filename)
+            if not match:
+                continue
+            upc, start_k, end_k = ledger_upc(match.group(1)), int(match.group(3)), int(match.group(4))
+            key = (upc, dirpath)
+            try:
+                modified = os.stat(os.path.join(dirpath, filename)).st_mtime
+            except OSError:
+                continue
+            if key in jobs:
+                low, high, first_modified = jobs[key]
+                jobs[key] = (min(low, start_k), max(high, end_k), min(first_modified, modified))
+            else:
+                jobs[key] = (start_k, end_k, modified)
+
+    with closing(connect_ledger(ledger_path)) as conn, conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO serial_ranges (upc, start_serial, end_serial, job_folder, created_at, source) VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (upc, start_k * 1000 + 1, max(end_k * 1000, start_k * 1000 + 1), job_folder,
+                 datetime.datetime.fromtimestamp(modified).isoformat(timespec='seconds'), 'import')
+                for (upc, job_folder), (start_k, end_k, modified) in jobs.items()
+            ],
+        )
+    return len(jobs)
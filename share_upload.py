@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Default local folder that DB files are written to before they are moved to the share
+STAGING_PATH = os.path.join(tempfile.gettempdir(), 'upc2epc-staging')
+
+
+class ShareUploader:
+    """ Moves finished files from fast local disk to the network share on a bounded pool of threads
+
+    Each file is copied under a hidden .partial name and then renamed into place, so anything watching the share
+    (printers, BarTender) only ever sees complete files. Failed copies are retried with exponential backoff. """
+    def __init__(self, workers=4, retries=5, backoff=0.5):
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='share-upload')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, local_path, dest_dir):
+        """ Queue local_path to be moved into dest_dir; the returned future resolves to the published path """
+        return self.executor.submit(self.publish, local_path, dest_dir)
+
+    def publish(self, local_path, dest_dir):
+        file_name = os.path.basename(local_path)
+        dest_path = os.path.join(dest_dir, file_name)
+        temp_path = os.path.join(dest_dir, f".{file_name}.{os.getpid()}-{threading.get_ident()}.partial")
+        for attempt in range(self.retries + 1):
+            try:
+                shutil.copy2(local_path, temp_path)
+                os.replace(temp_path, dest_path)
+                break
+            except OSError:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+        os.remove(local_path)
+        return dest_path
+
+    def close(self, wait=True):
+        self.executor.shutdown(wait=wait)
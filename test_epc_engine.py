@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from epc_engine import (EPC_SCHEMES, SGTIN_PARTITIONS, SSCC_PARTITIONS, db_chunks, db_file_name, decode_epc, encode_epc, epc_template, generate_epc,
+                        generate_epc_batch, normalize_gtin, read_roll_rows, roll_index_file_name, roll_plan, write_db_chunk,
+                        write_roll_index)
+
+class EncoderTest(unittest.TestCase):
+    def test_batch_matches_generate_epc(self):
+        """ The default encoding stays byte-identical to the original one-serial-at-a-time encoder """
+        for upc in ['012345678905', '614141123452', '000000000000']:
+            for start, count in [(0, 50), (1, 1000), (274877906943 - 10, 11)]:
+                self.assertEqual(generate_epc_batch(upc, start, count), [generate_epc(upc, sn) for sn in range(start, start + count)])
+
+    def test_gs1_tds_examples(self):
+        self.assertEqual(encode_epc(epc_template('80614141123458', 'sgtin-96', 5, 3), 6789), '3074257BF7194E4000001A85')
+        self.assertEqual(encode_epc(epc_template('10614141', 'sscc-96', 5, 3), 234567890), '3174257BF4499602D2000000')
+        decoded = decode_epc('3074257BF7194E4000001A85')
+        self.assertEqual((decoded['gtin14'], decoded['company_prefix'], decoded['filter'], decoded['serial']), ('80614141123458', '0614141', 3, 6789))
+        decoded = decode_epc('3174257BF4499602D2000000')
+        self.assertEqual((decoded['sscc'], decoded['serial']), ('106141412345678908', 234567890))
+
+    def test_sgtin_round_trip_every_partition(self):
+        gtin14 = '80614141123458'
+        for scheme in ['sgtin-96', 'sgtin-198']:
+            for partition in SGTIN_PARTITIONS:
+                for filter_value in [0, 1, 7]:
+                    template = epc_template(gtin14, scheme, partition, filter_value)
+                    serials = [0, 1, 123456789, template[4]] + (['32a/b', 'ABC-xyz_09'] if scheme == 'sgtin-198' else [])
+                    for serial in serials:
+                        epc = encode_epc(template, serial)
+                        self.assertEqual(len(epc) * 4, EPC_SCHEMES[scheme][1] + -EPC_SCHEMES[scheme][1] % 16)
+                        decoded = decode_epc(epc)
+                        self.assertEqual(decoded['scheme'], scheme)
+                        self.assertEqual((decoded['gtin14'], decoded['partition'], decoded['filter']), (gtin14, partition, filter_value))
+                        self.assertEqual(str(decoded['serial']), str(serial))
+
+    def test_sscc_round_trip_every_partition(self):
+        for partition, (cp_bits, cp_digits, serial_bits, sr_digits) in SSCC_PARTITIONS.items():
+            code = '3' + '0614141234567'[:cp_digits]
+            template = epc_template(code, 'sscc-96', partition, 2)
+            for serial in [0, 5, template[4]]:
+                decoded = decode_epc(encode_epc(template, serial))
+                self.assertEqual((decoded['company_prefix'], decoded['partition'], decoded['filter'], decoded['serial']),
+                                 (code[1:], partition, 2, serial))
+                self.assertEqual(decoded['serial_reference'][0], '3')
+
+    def test_upc_ean_and_gtin14_encode_alike(self):
+        self.assertEqual(normalize_gtin('012345678905'), '00012345678905')
+        self.assertEqual(generate_epc_batch('012345678905', 1, 5), generate_epc_batch('00012345678905', 1, 5))
+        self.assertEqual(generate_epc_batch('0012345678905', 1, 5), generate_epc_batch('00012345678905', 1, 5))
+
+    def test_rejects_bad_input(self):
+        template = epc_template('012345678905')
+        with self.assertRaises(ValueError):
+            encode_epc(template, template[4] + 1)
+        with self.assertRaises(ValueError):
+            encode_epc(template, -1)
+        for code, encoding in [('12345', ('sgtin-96', 5, 1)), ('012345678905', ('sgtin-96', 7, 1)),
+                               ('012345678905', ('sgtin-96', 5, 8)), ('012345678905', ('sgtin-64', 5, 1))]:
+            with self.assertRaises(ValueError):
+                epc_template(code, *encoding)
+        with self.assertRaises(ValueError):
+            decode_epc('not hex')
+
+class RollIndexTest(unittest.TestCase):
+    def test_roll_spanning_several_dbs(self):
+        """ A roll longer than a DB reads every DB it covers in order, not just the first and last """
+        upc, start_serial, end_serial, lpr, qty_db = '012345678905', 1, 3000, 2500, 1000
+        with tempfile.TemporaryDirectory() as folder:
+            for chunk in db_chunks(start_serial, end_serial, qty_db):
+                write_db_chunk(folder, upc, *chunk, db_format='text')
+            index_path = write_roll_index(os.path.join(folder, roll_index_file_name(upc, start_serial, end_serial)),
+                                          upc, start_serial, end_serial, lpr, qty_db)
+            expected = generate_epc_batch(upc, start_serial, end_serial - start_serial + 1)
+            for roll, first, last in [(1, 1, 2500), (2, 2501, 3000)]:
+                lines = read_roll_rows(index_path, roll)
+                self.assertEqual(lines, [f'{upc},{sn},{expected[sn - 1]}' for sn in range(first, last + 1)])
+        files = [db_file_name(upc, *chunk, 'txt') for chunk in db_chunks(start_serial, end_serial, qty_db)]
+        plan = list(roll_plan(upc, start_serial, end_serial, lpr, qty_db, db_format='text'))
+        self.assertEqual(plan[0][6:], (files[0], f'{files[1]};{files[2]}'))
+        self.assertEqual(plan[1][6:], (files[2], None))
+
+if __name__ == '__main__':
+    unittest.main()
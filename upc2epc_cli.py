@@ -0,0 +1,403 @@
+import argparse
+import csv
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from epc_audit import audit_share
+from epc_engine import (DB_FORMATS, DEFAULT_ENCODING, EPC_SCHEMES, RANGE_FORMATS, apply_overage, epc_template, generate_database,
+                        job_manifest_path, load_job_manifest, make_encoding, read_roll_rows, roll_index_file_name, roll_plan_file_name,
+                        verify_job, write_range, write_roll_index, write_roll_plan)
+from job_log import append_job_record, generation_record, timed
+from read_reconcile import format_runs, reconcile_log
+from serial_ledger import describe_overlaps, find_overlaps, import_share, ledger_upc, next_free_serial, record_range
+from share_upload import ShareUploader
+
+MANIFEST_COLUMNS = ['upc', 'start_serial', 'lpr', 'total_qty', 'overage_2', 'overage_7', 'qty_db', 'output_dir']
+# Optional manifest columns; a blank or missing value means the default SGTIN-96 encoding
+ENCODING_COLUMNS = ['scheme', 'partition', 'filter']
+
+
+def parse_flag(value):
+    return str(value).strip().lower() in ('1', 'y', 'yes', 'true', 'x')
+
+def make_job(upc, start_serial, lpr, total_qty, overage_2, overage_7, qty_db, output_dir, encoding=DEFAULT_ENCODING):
+    """ Validate one job the same way the Database Generator tab does and return it as a dict """
+    upc = str(upc).strip()
+    epc_template(upc, *encoding)
+    try:
+        start_serial = int(start_serial)
+        lpr = int(lpr)
+        qty_db = int(qty_db)
+        total_qty = apply_overage(int(total_qty), overage_2, overage_7)
+    except ValueError:
+        raise ValueError("Serial numbers and quantities must be integers.")
+    if not output_dir:
+        raise ValueError("An output directory is required.")
+    if total_qty <= 0 or qty_db <= 0 or lpr <= 0:
+        raise ValueError("LPR, total quantity and Qty/DB must be greater than zero.")
+    return {
+        'upc': upc,
+        'start_serial': start_serial,
+        'end_serial': start_serial + total_qty - 1,
+        'lpr': lpr,
+        'total_qty': total_qty,
+        'qty_db': qty_db,
+        'output_dir': output_dir,
+        'encoding': encoding,
+    }
+
+def read_manifest(manifest_path):
+    jobs = []
+    with open(manifest_path, newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in MANIFEST_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Manifest is missing column(s): {', '.join(missing)}")
+        for line_number, row in enumerate(reader, 2):
+            try:
+                encoding = make_encoding(row.get('scheme'), row.get('partition'), row.get('filter'))
+                jobs.append(make_job(
+                    row['upc'], row['start_serial'], row['lpr'], row['total_qty'],
+                    parse_flag(row['overage_2']), parse_flag(row['overage_7']), row['qty_db'], row['output_dir'], encoding,
+                ))
+            except ValueError as e:
+                raise ValueError(f"{manifest_path} line {line_number}: {str(e)}")
+    return jobs
+
+def check_overlaps(jobs, resume=False):
+    """ Overlaps with the serial ledger, and between the jobs themselves; returns a list of messages """
+    problems = []
+    for job_number, job in enumerate(jobs, 1):
+        overlaps = find_overlaps(job['upc'], job['start_serial'], job['end_serial'])
+        if resume:
+            # A finished run of this same job is already in the ledger
+            overlaps = [o for o in overlaps if os.path.normpath(o['job_folder']) != os.path.normpath(job['output_dir'])]
+        if overlaps:
+            problems.append(f"Job {job_number} ({job['upc']} {job['start_serial']}-{job['end_serial']}) overlaps:\n{describe_overlaps(overlaps)}")
+        for other_number, other in enumerate(jobs[:job_number - 1], 1):
+            # UPC-A, EAN-13 and GTIN-14 spellings of one item encode the same EPCs
+            if ledger_upc(other['upc']) == ledger_upc(job['upc']) and other['start_serial'] <= job['end_serial'] and other['end_serial'] >= job['start_serial']:
+                problems.append(f"Job {job_number} ({job['upc']} {job['start_serial']}-{job['end_serial']}) overlaps job {other_number}")
+    return problems
+
+def log_job(job, status, seconds, phases, db_format, error=None):
+    manifest = load_job_manifest(job_manifest_path(job['output_dir'], job['upc'], job['start_serial'], job['end_serial']))
+    append_job_record(generation_record(job, status, seconds, phases, manifest, source='cli', db_format=db_format, error=error))
+
+class BoundedExecutor:
+    """ Passes submit through to executor, blocking once max_pending submitted calls have not finished yet
+
+    Lets several jobs feed one process pool without any of them queueing its whole run ahead of the others. """
+    def __init__(self, executor, max_pending):
+        self.executor = executor
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, fn, *args, **kwargs):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+def run_job(job, executor, uploader, resume, staging_dir, db_format):
+    """ Generate one job's DBs, then its roll plan (and roll index) and ledger entry; returns (DB file paths, seconds) """
+    job_started = time.monotonic()
+    phases = {}
+    try:
+        os.makedirs(job['output_dir'], exist_ok=True)
+        with timed(phases, 'generate'):
+            written = generate_database(job['upc'], job['start_serial'], job['end_serial'], job['qty_db'], job['output_dir'],
+                                        executor=executor, resume=resume, staging_dir=staging_dir, uploader=uploader,
+                                        encoding=job['encoding'], db_format=db_format)
+        with timed(phases, 'roll_plan'):
+            write_roll_plan(os.path.join(job['output_dir'], roll_plan_file_name(job['upc'], job['start_serial'], job['end_serial'])),
+                            job['upc'], job['start_serial'], job['end_serial'], job['lpr'], job['qty_db'], job['encoding'], db_format)
+        if db_format != 'xlsx':
+            with timed(phases, 'roll_index'):
+                write_roll_index(os.path.join(job['output_dir'], roll_index_file_name(job['upc'], job['start_serial'], job['end_serial'])),
+                                 job['upc'], job['start_serial'], job['end_serial'], job['lpr'], job['qty_db'], job['encoding'])
+    except Exception as e:
+        log_job(job, 'failed', time.monotonic() - job_started, phases, db_format, error=str(e))
+        raise
+    with timed(phases, 'ledger_record'):
+        record_range(job['upc'], job['start_serial'], job['end_serial'], job['output_dir'])
+    elapsed = time.monotonic() - job_started
+    log_job(job, 'done', elapsed, phases, db_format)
+    return written, elapsed
+
+def run_jobs(jobs, workers=None, resume=False, staging_dir=None, db_format='xlsx'):
+    """ Run every job through one shared process pool so there is no per-job startup cost; returns failed job count
+
+    Up to workers jobs run side by side, so a manifest of small jobs still keeps every core busy. Their DB chunks
+    share a queue of twice the pool size, and each job finishes (roll plan, ledger) as soon as its last DB is in. """
+    workers = workers or os.cpu_count() or 1
+    failed = 0
+    started = time.monotonic()
+    total_labels = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, ShareUploader() as uploader, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') as job_runner:
+        executor = BoundedExecutor(pool, 2 * workers)
+        futures = {job_runner.submit(run_job, job, executor, uploader, resume, staging_dir, db_format): (job_number, job)
+                   for job_number, job in enumerate(jobs, 1)}
+        for future in as_completed(futures):
+            job_number, job = futures[future]
+            try:
+                written, elapsed = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{job_number}/{len(jobs)}] {job['upc']} FAILED: {str(e)}", file=sys.stderr)
+                continue
+            total_labels += job['total_qty']
+            print(f"[{job_number}/{len(jobs)}] {job['upc']} serials {job['start_serial']}-{job['end_serial']}: "
+                  f"{len(written)} DB file(s) in {elapsed:.1f}s -> {job['output_dir']}")
+    elapsed = time.monotonic() - started
+    print(f"{len(jobs) - failed} of {len(jobs)} job(s) done, {total_labels:,} labels in {elapsed:.1f}s")
+    return failed
+
+def run_verify(folder, encoding=None):
+    started = time.monotonic()
+    report = verify_job(folder, encoding=encoding)
+    elapsed = time.monotonic() - started
+    for upc, (first, last) in sorted(report['ranges'].items()):
+        print(f"{upc}: serials {first}-{last}")
+    for issue in report['issues']:
+        print(issue, file=sys.stderr)
+    rate = report['rows'] / elapsed if elapsed > 0 else 0
+    print(f"{report['files']} DB file(s), {report['rows']:,} EPC(s) checked in {elapsed:.1f}s ({rate:,.0f} rows/sec), {report['errors']} problem(s)")
+    return 1 if report['errors'] or not report['files'] else 0
+
+def run_audit(base_path, full=False, workers=None, report_path=None):
+    started = time.monotonic()
+    report = audit_share(base_path, full=full, workers=workers)
+    elapsed = time.monotonic() - started
+    for error in report['errors']:
+        print(f"Could not read {error}", file=sys.stderr)
+    for collision in report['collisions'][:50]:
+        print(f"{collision['count']:,} duplicate EPC(s) from {collision['first_epc']} (serials {collision['first_serial']}-{collision['last_serial']}):\n"
+              f"  {collision['files'][0]}\n  {collision['files'][1]}")
+    if len(report['collisions']) > 50:
+        print(f"...and {len(report['collisions']) - 50} more")
+    if report_path:
+        with open(report_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['First EPC', 'First Serial', 'Last Serial', 'Count', 'File', 'Also In'])
+            writer.writerows([c['first_epc'], c['first_serial'], c['last_serial'], c['count'], *c['files']] for c in report['collisions'])
+    duplicates = sum(collision['count'] for collision in report['collisions'])
+    print(f"{report['files']} DB file(s) ({report['read']} read, the rest unchanged since the last audit), {report['rows']:,} EPC(s) "
+          f"in {elapsed:.1f}s: {len(report['collisions'])} collision(s), {duplicates:,} duplicate EPC(s), {report['bad']:,} unreadable cell(s)")
+    return 1 if report['collisions'] or report['errors'] else 0
+
+def run_reconcile(job, log_paths, report_path=None, db_format='xlsx'):
+    started = time.monotonic()
+    report = reconcile_log(log_paths, job['upc'], job['start_serial'], job['end_serial'], job['lpr'], job['qty_db'], job['encoding'],
+                           db_format)
+    elapsed = time.monotonic() - started
+    for db in report['dbs']:
+        if db['missing'] or db['duplicated']:
+            print(f"{db['file']}: {db['missing']:,} missing, {db['duplicated']:,} duplicated")
+    for roll in report['rolls']:
+        if roll['missing']:
+            print(f"  Roll {roll['roll']} (DB{roll['db']}) missing: {format_runs(roll['missing_runs'])}")
+        if roll['duplicated']:
+            print(f"  Roll {roll['roll']} (DB{roll['db']}) duplicated: {format_runs(roll['duplicate_runs'])}")
+    for kind, count in sorted(report['unexpected_by_kind'].items(), key=lambda item: -item[1])[:20]:
+        print(f"Unexpected {kind}: {count:,} read(s)")
+    if report_path:
+        with open(report_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Roll #', 'DB #', 'First Serial', 'Last Serial', 'Missing', 'Duplicated', 'Extra Reads', 'Missing Serials', 'Duplicated Serials'])
+            writer.writerows([roll['roll'], roll['db'], roll['first_serial'], roll['last_serial'], roll['missing'], roll['duplicated'],
+                              roll['extra_reads'], format_runs(roll['missing_runs'], 1000), format_runs(roll['duplicate_runs'], 1000)]
+                             for roll in report['rolls'])
+    rate = report['reads'] / elapsed if elapsed > 0 else 0
+    print(f"{report['reads']:,} read(s) in {elapsed:.1f}s ({rate:,.0f} reads/sec): {report['read']:,} of {report['expected']:,} serials read, "
+          f"{report['missing']:,} missing, {report['duplicated']:,} duplicated ({report['extra_reads']:,} extra reads), {report['unexpected']:,} unexpected")
+    return 1 if report['missing'] or report['duplicated'] or report['unexpected'] else 0
+
+def add_encoding_arguments(parser, defaults_from_manifest=False):
+    default_scheme, default_partition, default_filter = DEFAULT_ENCODING
+    parser.add_argument('--scheme', choices=list(EPC_SCHEMES), default=None if defaults_from_manifest else default_scheme,
+                        help="EPC scheme" + (" (default: from the job manifest)" if defaults_from_manifest else f" (default: {default_scheme})"))
+    parser.add_argument('--partition', type=int, default=None, help=f"GS1 partition 0-6, sets the company prefix length (default: {default_partition})")
+    parser.add_argument('--filter', type=int, default=None, help=f"EPC filter value 0-7 (default: {default_filter})")
+
+def add_job_options(parser, defaults=True):
+    """ Options for running jobs; without defaults they are only set when given, leaving what was given before the subcommand """
+    default = (lambda value: value) if defaults else (lambda value: argparse.SUPPRESS)
+    parser.add_argument('--workers', type=int, default=default(None), help="Worker processes (default: one per CPU core)")
+    parser.add_argument('--resume', action='store_true', default=default(False),
+                        help="Keep DB files that match an earlier run's job manifest and only write the rest")
+    parser.add_argument('--staging-dir', default=default(None), help="Write DB files to this local folder first and move them to the output folder in the background")
+    parser.add_argument('--allow-overlap', action='store_true', default=default(False),
+                        help="Generate even if serials overlap earlier jobs in the serial ledger")
+    parser.add_argument('--db-format', choices=list(DB_FORMATS), default=default('xlsx'),
+                        help="xlsx DB files, BarTender text databases (.txt) with a roll index, or both (default: xlsx)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless UPC to EPC Database Generator")
+    # Accepted before the subcommand (as they always were) or after it
+    add_job_options(parser)
+    job_options = argparse.ArgumentParser(add_help=False)
+    add_job_options(job_options, defaults=False)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', parents=[job_options], help="Generate the DB files for a single job")
+    generate.add_argument('--upc', required=True)
+    generate.add_argument('--start-serial', required=True)
+    generate.add_argument('--lpr', required=True, help="Labels per roll")
+    generate.add_argument('--total-qty', required=True)
+    generate.add_argument('--overage-2', action='store_true', help="Add 2%% overage")
+    generate.add_argument('--overage-7', action='store_true', help="Add 7%% overage")
+    generate.add_argument('--qty-db', required=True, help="Labels per DB file")
+    generate.add_argument('--output-dir', required=True)
+    add_encoding_arguments(generate)
+
+    manifest = commands.add_parser('manifest', parents=[job_options], help="Generate every job listed in a CSV manifest")
+    manifest.add_argument('manifest_path', help=f"CSV with columns: {', '.join(MANIFEST_COLUMNS)}, optionally {', '.join(ENCODING_COLUMNS)}")
+
+    verify = commands.add_parser('verify', help="Decode every EPC in a folder's DB files and check them against the UPC and Serial # columns")
+    verify.add_argument('folder')
+    add_encoding_arguments(verify, defaults_from_manifest=True)
+
+    plan = commands.add_parser('roll-plan', help="Export the roll plan of a job without generating its DB files")
+    plan.add_argument('--upc', required=True)
+    plan.add_argument('--start-serial', required=True)
+    plan.add_argument('--lpr', required=True, help="Labels per roll")
+    plan.add_argument('--total-qty', required=True)
+    plan.add_argument('--overage-2', action='store_true', help="Add 2%% overage")
+    plan.add_argument('--overage-7', action='store_true', help="Add 7%% overage")
+    plan.add_argument('--qty-db', required=True, help="Labels per DB file")
+    plan.add_argument('--output', required=True, help="Roll plan file; .xlsx for a sheet, anything else for CSV")
+    add_encoding_arguments(plan)
+    plan.add_argument('--db-format', choices=list(DB_FORMATS), default=argparse.SUPPRESS, help="DB files the job was written as (default: xlsx)")
+
+    ledger_import = commands.add_parser('ledger-import', help="Backfill the serial ledger from DB file names under a folder")
+    ledger_import.add_argument('base_path')
+
+    single = commands.add_parser('range', help="Write one start-end serial range to a single file, split at Excel's row limit")
+    single.add_argument('--upc', required=True)
+    single.add_argument('--start-serial', type=int, required=True)
+    single.add_argument('--end-serial', type=int, required=True)
+    single.add_argument('--output-dir', required=True)
+    single.add_argument('--format', choices=list(RANGE_FORMATS), default='xlsx')
+    single.add_argument('--max-rows', type=int, default=None, help="Split into files of at most this many labels")
+    add_encoding_arguments(single)
+
+    reconcile = commands.add_parser('reconcile', help="Check reader logs against a job: missing, duplicated and unexpected EPCs by DB and roll")
+    reconcile.add_argument('--upc', required=True)
+    reconcile.add_argument('--start-serial', required=True)
+    reconcile.add_argument('--lpr', required=True, help="Labels per roll")
+    reconcile.add_argument('--total-qty', required=True)
+    reconcile.add_argument('--overage-2', action='store_true', help="Add 2%% overage")
+    reconcile.add_argument('--overage-7', action='store_true', help="Add 7%% overage")
+    reconcile.add_argument('--qty-db', required=True, help="Labels per DB file")
+    reconcile.add_argument('--report', default=None, help="Also write a per-roll CSV report to this file")
+    reconcile.add_argument('logs', nargs='+', help="Reader / verification station CSV logs with an EPC column")
+    add_encoding_arguments(reconcile)
+    reconcile.add_argument('--db-format', choices=list(DB_FORMATS), default=argparse.SUPPRESS, help="DB files the job was written as (default: xlsx)")
+
+    audit = commands.add_parser('audit', help="Find EPCs that appear in more than one DB file anywhere under a folder")
+    audit.add_argument('base_path')
+    audit.add_argument('--full', action='store_true', help="Read every DB file again instead of only those changed since the last audit")
+    audit.add_argument('--report', default=None, help="Also write every collision to this CSV file")
+    audit.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Worker processes (default: one per CPU core)")
+
+    reprint = commands.add_parser('reprint-roll', help="Write one roll's rows out of a job's text databases, seeking through its roll index")
+    reprint.add_argument('index_path', help="The job's {upc}.RollIndex.{start}-{end}.csv")
+    reprint.add_argument('roll', type=int, help="Roll #")
+    reprint.add_argument('--output', default=None, help="Text database to write (default: print the rows)")
+
+    next_serial = commands.add_parser('next-serial', help="Print the next free serial for a UPC from the serial ledger")
+    next_serial.add_argument('upc')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'verify':
+        if args.scheme is None and args.partition is None and args.filter is None:
+            return run_verify(args.folder)
+        try:
+            return run_verify(args.folder, make_encoding(args.scheme, args.partition, args.filter))
+        except ValueError as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+    if args.command == 'ledger-import':
+        print(f"{import_share(args.base_path)} job range(s) found under {args.base_path}")
+        return 0
+    if args.command == 'range':
+        started = time.monotonic()
+        try:
+            os.makedirs(args.output_dir, exist_ok=True)
+            written = write_range(args.upc.strip(), args.start_serial, args.end_serial, args.output_dir, args.format, args.max_rows,
+                                  make_encoding(args.scheme, args.partition, args.filter))
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+        elapsed = time.monotonic() - started
+        labels = args.end_serial - args.start_serial + 1
+        print("\n".join(written))
+        print(f"{labels:,} labels in {len(written)} file(s) in {elapsed:.1f}s ({labels / elapsed if elapsed > 0 else 0:,.0f} labels/sec)")
+        return 0
+    if args.command == 'reconcile':
+        try:
+            job = make_job(args.upc, args.start_serial, args.lpr, args.total_qty, args.overage_2, args.overage_7, args.qty_db, '.',
+                           make_encoding(args.scheme, args.partition, args.filter))
+            return run_reconcile(job, args.logs, args.report, args.db_format)
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+    if args.command == 'audit':
+        return run_audit(args.base_path, args.full, args.workers, args.report)
+    if args.command == 'reprint-roll':
+        try:
+            lines = read_roll_rows(args.index_path, args.roll)
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+        if args.output:
+            with open(args.output, 'w', encoding='ascii', newline='') as f:
+                f.write('UPC,Serial #,EPC\r\n' + ''.join(line + '\r\n' for line in lines))
+            print(f"{len(lines)} label(s) of roll {args.roll} written to {args.output}")
+        else:
+            print('\n'.join(lines))
+        return 0
+    if args.command == 'next-serial':
+        print(next_free_serial(args.upc))
+        return 0
+    if args.command == 'roll-plan':
+        try:
+            job = make_job(args.upc, args.start_serial, args.lpr, args.total_qty, args.overage_2, args.overage_7, args.qty_db,
+                           os.path.dirname(args.output) or '.', make_encoding(args.scheme, args.partition, args.filter))
+        except ValueError as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+        write_roll_plan(args.output, job['upc'], job['start_serial'], job['end_serial'], job['lpr'], job['qty_db'], job['encoding'],
+                        args.db_format)
+        print(f"{math.ceil(job['total_qty'] / job['lpr'])} roll(s) written to {args.output}")
+        return 0
+    try:
+        if args.command == 'generate':
+            jobs = [make_job(args.upc, args.start_serial, args.lpr, args.total_qty, args.overage_2, args.overage_7, args.qty_db, args.output_dir,
+                             make_encoding(args.scheme, args.partition, args.filter))]
+        else:
+            jobs = read_manifest(args.manifest_path)
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    problems = check_overlaps(jobs, args.resume)
+    if problems:
+        print("\n\n".join(problems), file=sys.stderr)
+        if not args.allow_overlap:
+            print("Error: serial ranges overlap, nothing was generated (use --allow-overlap to override)", file=sys.stderr)
+            return 2
+    return 1 if run_jobs(jobs, args.workers, args.resume, args.staging_dir, args.db_format) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())